@@ -3,23 +3,27 @@
 Task 1: Handle Database Connections with a Decorator
 
 This script implements a decorator `with_db_connection` that automatically
-opens a SQLite database connection, passes it to the wrapped function,
-and ensures the connection is closed afterward.
+borrows a SQLite database connection from a shared pool (db_pool.py),
+passes it to the wrapped function, and hands it back afterward.
 
 This approach avoids repetitive connection setup and cleanup in each function.
 """
 
-import sqlite3
 import functools
 
+from db_pool import fetchone, get_pool
+
 
 def with_db_connection(func):
     """
     Decorator to manage database connections.
 
-    It opens a connection to `users.db`, injects it as the first argument
-    to the decorated function, and ensures the connection is closed
-    after the function execution — even if an error occurs.
+    It borrows a connection to `users.db` from the process-wide pool
+    (db_pool.get_pool()), injects it as the first argument to the
+    decorated function, and hands it back to the pool after the function
+    execution — even if an error occurs. Returned connections are reset
+    (open transaction rolled back, hooks cleared) and stay open, so later
+    calls skip opening the file and keep a warm page cache.
 
     Args:
         func (function): The target database function.
@@ -29,12 +33,9 @@ def with_db_connection(func):
     """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        with get_pool().connection() as conn:
             # Inject the connection as the first argument
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
 
@@ -47,12 +48,13 @@ def get_user_by_id(conn, user_id):
         conn (sqlite3.Connection): The active database connection.
         user_id (int): The ID of the user to retrieve.
 
+    The lookup runs through the connection's statement cache, so repeated
+    calls reuse the compiled statement and its cursor.
+
     Returns:
         tuple or None: User record if found, otherwise None.
     """
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-    return cursor.fetchone()
+    return fetchone(conn, "SELECT * FROM users WHERE id = ?", (user_id,))
 
 
 # Example usage
@@ -3,29 +3,53 @@
 Task 2: Transaction Management Decorator
 
 This script implements two decorators:
-1. with_db_connection - automatically opens and closes a SQLite database connection.
+1. with_db_connection - borrows a pooled SQLite database connection (db_pool.py).
 2. transactional - wraps database operations in a transaction, committing changes
-   if successful or rolling them back if an error occurs.
+   if successful or rolling them back if an error occurs. A successful commit
+   invalidates the cached query results that read the tables it wrote.
+
+Inside a `with batch():` block, transactional calls are queued instead of
+committed one by one: each call returns a Future, and the queued calls
+are written in a single transaction (runs of the same statement go
+through executemany) when the block ends or the batch window fills up.
+If that transaction fails, the calls are replayed one by one, each in its
+own savepoint, so only the failing calls are rejected.
+
+For write-behind, GroupCommitWriter takes such calls from any thread
+(writer.enqueue(update_user_email, ...) returns a Future at once) and a
+single writer thread commits them in groups, which suits SQLite's
+one-writer-at-a-time model.
 """
 
-import sqlite3
+import atexit
 import functools
+import queue
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from db_pool import ConnectionPool, get_pool
+from query_cache import get_default_cache, tables_written
 
 
 def with_db_connection(func):
     """
     Decorator to handle database connections.
 
-    Opens a connection to 'users.db', injects it into the wrapped function,
-    and ensures the connection is closed after execution.
+    Borrows a connection to 'users.db' from the process-wide pool
+    (db_pool.get_pool()), injects it into the wrapped function, and returns
+    it to the pool, reset, after execution.
     """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        if getattr(func, "_batched", False) and current_batch() is not None:
+            # Batched transactional calls only record their statements;
+            # the batch borrows a connection when it flushes.
+            return func(None, *args, **kwargs)
+        with get_pool().connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
 
@@ -36,6 +60,13 @@ def transactional(func):
     Begins a transaction, commits if the wrapped function executes successfully,
     or rolls back if an exception occurs.
 
+    Statements run inside the transaction are traced; once the commit
+    succeeds, cached query results (query_cache.get_default_cache()) that read a
+    table written by the transaction are invalidated.
+
+    Inside a `with batch():` block the call is queued in the batch instead
+    and a Future is returned (see WriteBatch).
+
     Args:
         func (function): The database operation function.
 
@@ -44,17 +75,450 @@ def transactional(func):
     """
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        pending = current_batch()
+        if pending is not None:
+            return pending.submit(func, args, kwargs)
+        statements = []
+        conn.set_trace_callback(statements.append)
         try:
             result = func(conn, *args, **kwargs)
+            conn.set_trace_callback(None)
             conn.commit()
-            return result
         except Exception as e:
+            conn.set_trace_callback(None)
             conn.rollback()
             print(f"Transaction failed: {e}")
             raise
+        invalidate_written_tables(statements)
+        return result
+    wrapper._batched = True  # with_db_connection lends it no connection in a batch
     return wrapper
 
 
+def invalidate_written_tables(statements):
+    """
+    Invalidate the cached results that read any table written by
+    `statements` (SQL strings of a committed transaction).
+    """
+    written = set()
+    for statement in statements:
+        written |= tables_written(statement)
+    if written:
+        get_default_cache().invalidate_tables(written)
+
+
+class _RecordingCursor:
+    """Cursor of a _RecordingConnection: executes nothing, returns no rows."""
+
+    rowcount = -1
+    lastrowid = None
+
+    def __init__(self, recorder):
+        self._recorder = recorder
+
+    def execute(self, sql, params=()):
+        self._recorder.execute(sql, params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._recorder.executemany(sql, seq_of_params)
+        return self
+
+    def _no_rows(self, *args):
+        raise TypeError("Batched calls cannot read results before the batch is flushed")
+
+    fetchone = fetchmany = fetchall = __iter__ = _no_rows
+
+    def close(self):
+        pass
+
+
+def _copy_params(params):
+    # Named parameters (:name) come as a mapping and must stay one.
+    if isinstance(params, Mapping):
+        return dict(params)
+    return tuple(params)
+
+
+class _RecordingConnection:
+    """
+    Passed to a transactional function queued in a batch, in place of the
+    connection: it records the statements the function executes.
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return _RecordingCursor(self)
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, _copy_params(params)))
+        return _RecordingCursor(self)
+
+    def executemany(self, sql, seq_of_params):
+        self.statements.extend((sql, _copy_params(params)) for params in seq_of_params)
+        return _RecordingCursor(self)
+
+
+class _QueuedCall:
+    def __init__(self, statements, result):
+        self.statements = statements
+        self.result = result
+        self.future = Future()
+
+
+def _record_call(func, args, kwargs):
+    """Run func against a _RecordingConnection and return it as a _QueuedCall."""
+    recorder = _RecordingConnection()
+    return _QueuedCall(recorder.statements, func(recorder, *args, **kwargs))
+
+
+class WriteBatch:
+    """
+    Queue of transactional calls written together in one transaction.
+
+    Calls are flushed when `max_size` calls are queued, when the first
+    queued call is `max_delay` seconds old (checked as calls arrive), and
+    when the `batch()` block ends. Each call's Future resolves to the
+    function's return value once its statements are committed, or to the
+    exception that made its statements fail.
+
+    Only write-only functions can be batched: their statements run at
+    flush time, so results cannot be fetched inside the function.
+
+    Flushes borrow a connection from `pool` (default: db_pool.get_pool()).
+    """
+
+    def __init__(self, max_size=1000, max_delay=None, pool=None):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.pool = pool
+        self._calls = []
+        self._opened_at = None
+        self.flushes = 0
+        self.committed = 0
+        self.rejected = 0
+        self.fallbacks = 0
+
+    def __len__(self):
+        return len(self._calls)
+
+    def submit(self, func, args, kwargs):
+        """Record the statements of func(*args, **kwargs) and queue them."""
+        call = _record_call(func, args, kwargs)
+        if not self._calls:
+            self._opened_at = time.monotonic()
+        self._calls.append(call)
+        if len(self._calls) >= self.max_size or (
+            self.max_delay is not None
+            and time.monotonic() - self._opened_at >= self.max_delay
+        ):
+            self.flush()
+        return call.future
+
+    def discard(self):
+        """Drop the queued calls, cancelling their futures."""
+        calls, self._calls = self._calls, []
+        for call in calls:
+            call.future.cancel()
+
+    def flush(self):
+        """Write the queued calls; returns the number committed."""
+        calls, self._calls = self._calls, []
+        return self.write(calls)
+
+    def write(self, calls):
+        """
+        Write `calls` (_QueuedCall) in one transaction, falling back to one
+        savepoint per call, and resolve their futures. Returns the number
+        committed.
+        """
+        if not calls:
+            return 0
+        self.flushes += 1
+        pool = self.pool or get_pool()
+        try:
+            with pool.connection() as conn:
+                try:
+                    self._write_grouped(conn, calls)
+                    committed = calls
+                except Exception as e:
+                    conn.rollback()
+                    self.fallbacks += 1
+                    print(f"Batch of {len(calls)} calls failed: {e}. Retrying one call at a time...")
+                    committed = self._write_each(conn, calls)
+        except BaseException as e:
+            for call in calls:
+                if not call.future.done():
+                    call.future.set_exception(e)
+            raise
+        self.committed += len(committed)
+        self.rejected += len(calls) - len(committed)
+        # The writes are committed: resolve their futures before anything
+        # else can fail.
+        for call in committed:
+            call.future.set_result(call.result)
+        try:
+            invalidate_written_tables(
+                [sql for call in committed for sql, _ in call.statements]
+            )
+        except Exception as e:
+            print(f"Cache invalidation after a batch failed: {e}. Clearing the cache...")
+            try:
+                get_default_cache().clear()
+            except Exception as e:
+                print(f"Clearing the cache failed: {e}")
+        return len(committed)
+
+    def _write_grouped(self, conn, calls):
+        # Consecutive runs of the same SQL and parameter style (named or
+        # positional) go through one executemany; the order is kept.
+        conn.execute("BEGIN")
+        run_key, run_params = None, []
+        for call in calls:
+            for sql, params in call.statements:
+                key = (sql, isinstance(params, dict))
+                if key != run_key and run_params:
+                    conn.executemany(run_key[0], run_params)
+                    run_params = []
+                run_key = key
+                run_params.append(params)
+        if run_params:
+            conn.executemany(run_key[0], run_params)
+        conn.commit()
+
+    def _write_each(self, conn, calls):
+        committed = []
+        conn.execute("BEGIN")
+        try:
+            for call in calls:
+                conn.execute("SAVEPOINT batched_call")
+                try:
+                    for sql, params in call.statements:
+                        conn.execute(sql, params)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO batched_call")
+                    conn.execute("RELEASE batched_call")
+                    print(f"Transaction failed: {e}")
+                    call.future.set_exception(e)
+                else:
+                    conn.execute("RELEASE batched_call")
+                    committed.append(call)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return committed
+
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """
+    Write-behind queue drained by one writer thread.
+
+    enqueue() records the statements of a transactional call on the
+    calling thread, queues them and returns a Future right away. The
+    writer thread takes the first queued call, keeps collecting for up to
+    `flush_interval` seconds or `max_batch` calls, and commits the group
+    as a WriteBatch does (executemany, then per-call savepoints on
+    failure).
+
+    A Future resolves once the transaction holding its call has
+    committed. With durable=True (the default) the writer's connection
+    uses PRAGMA synchronous=FULL, so the commit has been synced to disk:
+    the write survives a power loss. With durable=False it uses NORMAL
+    (WAL): the write survives a crash of the process but the last
+    commits can be lost if the machine goes down.
+
+    Args:
+        flush_interval (float): Longest a call waits for others to join
+            its group, in seconds.
+        max_batch (int): Most calls committed in one transaction.
+        durable (bool): Sync every group commit to disk.
+        path (str): Database file (default: the pool's).
+    """
+
+    def __init__(self, flush_interval=0.005, max_batch=1000, durable=True,
+                 path=None):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.durable = durable
+        pool = ConnectionPool(
+            path or get_pool().path, size=1,
+            pragmas={"synchronous": "FULL" if durable else "NORMAL"},
+        )
+        self._batch = WriteBatch(max_size=max_batch, pool=pool)
+        self._queue = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name="group-commit-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, func, args, kwargs):
+        """Queue func(*args, **kwargs) (a transactional function); returns a Future."""
+        call = _record_call(func, args, kwargs)
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("GroupCommitWriter is closed")
+            self._queue.put(call)
+        return call.future
+
+    def enqueue(self, func, *args, **kwargs):
+        """
+        Call a transactional function, e.g. update_user_email, in
+        write-behind mode:
+
+            future = writer.enqueue(update_user_email, user_id=1, new_email=e)
+            future.result()   # blocks until committed
+        """
+        with write_behind(self):
+            return func(*args, **kwargs)
+
+    def flush(self, timeout=None):
+        """Block until every call enqueued so far is committed or rejected."""
+        marker = Future()
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("GroupCommitWriter is closed")
+            self._queue.put(marker)
+        marker.result(timeout)
+
+    def close(self, timeout=None):
+        """Write what is queued, then stop the writer thread."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._batch.pool.close()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "flushes": self._batch.flushes,
+            "committed": self._batch.committed,
+            "rejected": self._batch.rejected,
+            "fallbacks": self._batch.fallbacks,
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            calls, markers = [], []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, _QueuedCall):
+                    calls.append(item)
+                else:
+                    markers.append(item)
+                if stopping or markers or len(calls) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+            try:
+                self._batch.write(calls)
+            except Exception as e:
+                # The futures of the group already carry the exception.
+                print(f"Group commit of {len(calls)} calls failed: {e}")
+            for marker in markers:
+                marker.set_result(None)
+        # Nothing is queued after _STOP, but never leave a caller waiting.
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, _QueuedCall):
+                item.future.set_exception(RuntimeError("GroupCommitWriter is closed"))
+            elif item is not _STOP:
+                item.set_result(None)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """
+    Returns the process-wide GroupCommitWriter, started on first use and
+    closed (after writing what is queued) at interpreter exit.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = GroupCommitWriter()
+            atexit.register(_writer.close)
+        return _writer
+
+
+_local = threading.local()
+
+
+def current_batch():
+    """
+    Where transactional calls in this thread are sent, or None: the
+    WriteBatch of the enclosing `with batch():` block or the
+    GroupCommitWriter of `with write_behind():`. Both take submit(func,
+    args, kwargs) and return a Future.
+    """
+    return getattr(_local, "batch", None)
+
+
+@contextmanager
+def batch(max_size=1000, max_delay=None):
+    """
+    Queue the transactional calls made in this block (in this thread) and
+    write them in grouped transactions:
+
+        with batch():
+            futures = [update_user_email(user_id=i, new_email=e) for i, e in rows]
+        failed = [f for f in futures if f.exception()]
+
+    The remaining calls are flushed when the block exits normally; if it
+    raises they are discarded. A nested batch() joins the outer one.
+    """
+    outer = current_batch()
+    if outer is not None:
+        yield outer
+        return
+    pending = _local.batch = WriteBatch(max_size, max_delay)
+    try:
+        yield pending
+    except BaseException:
+        _local.batch = None
+        pending.discard()
+        raise
+    _local.batch = None
+    pending.flush()
+
+
+@contextmanager
+def write_behind(writer=None):
+    """
+    Send the transactional calls made in this block (in this thread) to a
+    GroupCommitWriter (default: get_writer()); each returns a Future.
+    Unlike batch(), leaving the block does not wait for the writes.
+    """
+    writer = writer or get_writer()
+    outer = current_batch()
+    _local.batch = writer
+    try:
+        yield writer
+    finally:
+        _local.batch = outer
+
+
 @with_db_connection
 @transactional
 def update_user_email(conn, user_id, new_email):
@@ -3,31 +3,30 @@
 Task 3: Retry Database Queries Decorator
 
 This script implements:
-1. with_db_connection - Automatically opens and closes a SQLite database connection.
+1. with_db_connection - Borrows a pooled SQLite database connection (db_pool.py).
 2. retry_on_failure - Retries a database operation a set number of times if it fails.
 
 The retry decorator adds resilience to database operations that may fail due to transient issues.
 """
 
 import time
-import sqlite3
 import functools
 
+from db_pool import fetchall, get_pool
+
 
 def with_db_connection(func):
     """
     Decorator to handle database connections.
 
-    Opens a connection to 'users.db', injects it into the wrapped function,
-    and ensures the connection is closed after execution.
+    Borrows a connection to 'users.db' from the process-wide pool
+    (db_pool.get_pool()), injects it into the wrapped function, and returns
+    it to the pool, reset, after execution.
     """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        with get_pool().connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
 
@@ -71,9 +70,7 @@ def fetch_users_with_retry(conn):
     Returns:
         list: All rows from the users table.
     """
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users")
-    return cursor.fetchall()
+    return fetchall(conn, "SELECT * FROM users")
 
 
 # Example usage
@@ -3,57 +3,118 @@
 Task 4: Cache Database Queries Decorator
 
 This script implements:
-1. with_db_connection - Manages opening and closing the database connection.
+1. with_db_connection - Borrows a pooled database connection (db_pool.py).
 2. cache_query - Caches query results to avoid redundant database calls.
 
 Caching improves performance when the same query is executed multiple times.
+Results live in a bounded LRU cache with per-entry expiry, keyed on the
+normalized SQL plus its parameters; query_cache.stats() reports hits,
+misses and evictions. Each entry remembers the tables it reads, so a
+committed write only invalidates the entries it can have made stale.
+
+With max_stale, an expired result is still returned right away while a
+background thread re-runs the query on its own connection
+(stale-while-revalidate); refresh_ahead refreshes hot entries before
+they expire, so callers rarely wait on the database.
 """
 
-import sqlite3
 import functools
 
-# Global cache for storing query results
-query_cache = {}
+from db_pool import fetchall, get_pool
+from query_cache import get_default_cache, make_key, tables_read
+
+# Global cache for storing query results: the process-wide backend from
+# query_cache.py (an LRU bounded by entry count and estimated bytes with a
+# per-entry TTL by default, or a SQLite file shared by all workers with
+# QUERY_CACHE_BACKEND=sqlite:<path>). Writes committed through
+# `transactional` invalidate the entries reading the tables they touched.
+query_cache = get_default_cache()
 
 
 def with_db_connection(func):
     """
     Decorator to handle database connections.
 
-    Opens a connection to 'users.db', passes it to the wrapped function,
-    and ensures the connection is closed after use.
+    Borrows a connection to 'users.db' from the process-wide pool
+    (db_pool.get_pool()), passes it to the wrapped function, and returns
+    it to the pool, reset, after use.
     """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        with get_pool().connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
 
-def cache_query(func):
+def cache_query(func=None, *, ttl=None, cache=None, max_stale=0,
+                refresh_ahead=0, hot_hits=2, connect=None):
     """
-    Decorator to cache database query results based on the SQL query string.
+    Decorator to cache database query results based on the SQL query string
+    and its parameters.
 
-    If the query has been executed before, returns the cached result instead of
+    If the same (normalized) query with the same parameters has been executed
+    before and its entry has not expired, returns the cached result instead of
     re-executing the database query.
 
+    Can be used bare (@cache_query) or with options (@cache_query(ttl=60)).
+
+    Args:
+        ttl (float): Time-to-live for entries of this function
+            (default: the cache's own TTL).
+        cache (CacheBackend): Cache to use (default: the process-wide
+            backend, see query_cache.get_default_cache).
+        max_stale (float): Seconds an expired result may still be served
+            while it is refreshed in the background (0 = wait for the
+            query once the entry expires).
+        refresh_ahead (float): Refresh an entry read at least `hot_hits`
+            times in the background once fewer than this many seconds of
+            its TTL remain.
+        hot_hits (int): Reads after which an entry counts as hot.
+        connect (callable): Opens the connection a background refresh
+            runs the query on; it is closed afterwards (default: borrow
+            one from the db_pool pool).
+
     Returns:
         function: Wrapped function with caching logic.
     """
-    @functools.wraps(func)
-    def wrapper(conn, query, *args, **kwargs):
-        if query in query_cache:
-            print(f"Using cached result for query: {query}")
-            return query_cache[query]
-
-        print(f"Executing and caching result for query: {query}")
-        result = func(conn, query, *args, **kwargs)
-        query_cache[query] = result
-        return result
-    return wrapper
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(conn, query, *args, **kwargs):
+            store = get_default_cache() if cache is None else cache
+            key = make_key(query, args, kwargs)
+
+            def run_query():
+                print(f"Executing and caching result for query: {query}")
+                return func(conn, query, *args, **kwargs)
+
+            refresh = None
+            if max_stale or refresh_ahead:
+                # The caller's connection is closed by the time the
+                # refresh runs, so it opens its own.
+                def refresh():
+                    print(f"Refreshing cached result for query: {query}")
+                    if connect is None:
+                        with get_pool().connection() as refresh_conn:
+                            return func(refresh_conn, query, *args, **kwargs)
+                    refresh_conn = connect()
+                    try:
+                        return func(refresh_conn, query, *args, **kwargs)
+                    finally:
+                        refresh_conn.close()
+
+            result, computed = store.get_or_compute(
+                key, run_query, ttl, tables=tables_read(query),
+                max_stale=max_stale, refresh=refresh,
+                refresh_ahead=refresh_ahead, hot_hits=hot_hits,
+            )
+            if not computed:
+                print(f"Using cached result for query: {query}")
+            return result
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
 
 
 @with_db_connection
@@ -69,9 +130,7 @@ def fetch_users_with_cache(conn, query):
     Returns:
         list: Query result set.
     """
-    cursor = conn.cursor()
-    cursor.execute(query)
-    return cursor.fetchall()
+    return fetchall(conn, query)
 
 
 # Example usage
@@ -83,3 +142,4 @@ if __name__ == "__main__":
     users_again = fetch_users_with_cache(query="SELECT * FROM users")
 
     print(users_again)
+    print(query_cache.stats())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-call latency of with_db_connection, connect-per-call vs pooled.
+
+Runs the get_user_by_id point lookup (SELECT * FROM users WHERE id = ?)
+`--calls` times, first opening and closing users.db on every call (the
+old with_db_connection), then borrowing from db_pool.ConnectionPool with
+a new cursor per call, then through the pooled connection's statement
+cache (db_pool.fetchone), and prints mean / p50 / p99 latency per call. With --threads N the calls are
+spread over N threads sharing one pool.
+
+Without --db a temporary database with `--rows` users is created.
+
+Usage:
+    python3 bench_db_pool.py [--calls 5000] [--threads 1] [--rows 10000] [--db users.db]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from db_pool import ConnectionPool, fetchone
+
+LOOKUP = "SELECT * FROM users WHERE id = ?"
+
+
+def create_users_db(path, rows):
+    conn = sqlite3.connect(path)
+    # Same journal mode as the pool sets, so both runs read a WAL database.
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)"
+    )
+    conn.executemany(
+        "INSERT INTO users (id, name, email, age) VALUES (?, ?, ?, ?)",
+        ((i, f"user{i}", f"user{i}@example.com", 18 + i % 60) for i in range(1, rows + 1)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def connect_per_call(path):
+    def lookup(user_id):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.cursor().execute(LOOKUP, (user_id,)).fetchone()
+        finally:
+            conn.close()
+    return lookup
+
+
+def pooled(pool):
+    def lookup(user_id):
+        with pool.connection() as conn:
+            return conn.cursor().execute(LOOKUP, (user_id,)).fetchone()
+    return lookup
+
+
+def pooled_statement_cache(pool):
+    def lookup(user_id):
+        with pool.connection() as conn:
+            return fetchone(conn, LOOKUP, (user_id,))
+    return lookup
+
+
+def run(lookup, ids, threads):
+    def timed(user_id):
+        started = time.perf_counter()
+        lookup(user_id)
+        return time.perf_counter() - started
+
+    if threads == 1:
+        return [timed(i) for i in ids]
+    with ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(timed, ids))
+
+
+def report(label, latencies):
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:>16}: mean {statistics.mean(latencies) * 1e6:8.1f}us  "
+          f"p50 {statistics.median(latencies) * 1e6:8.1f}us  p99 {p99 * 1e6:8.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--db")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    path = args.db
+    if path is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp_dir.name, "users.db")
+        create_users_db(path, args.rows)
+
+    conn = sqlite3.connect(path)
+    (count,) = conn.execute("SELECT COUNT(*) FROM users").fetchone()
+    conn.close()
+    ids = [random.randint(1, max(count, 1)) for _ in range(args.calls)]
+
+    try:
+        report("connect per call", run(connect_per_call(path), ids, args.threads))
+        with ConnectionPool(path, size=max(args.threads, 1)) as pool:
+            report("pooled", run(pooled(pool), ids, args.threads))
+            report("statement cache", run(pooled_statement_cache(pool), ids, args.threads))
+            print(pool.stats())
+            print(pool.statement_stats())
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
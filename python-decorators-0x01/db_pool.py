@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Pool of users.db connections behind the `with_db_connection` decorators.
+
+Connections stay open between calls, so SQLite keeps its parsed schema
+and page cache. PRAGMAs are applied once per connection, and a returned
+connection is reset (transaction rolled back, hooks cleared). Each one
+carries a StatementCache used by execute()/fetchone()/fetchall(). A
+forked child starts with empty pools and never touches the parent's
+connections.
+
+Settings: SQLITE_DB_PATH, SQLITE_POOL_SIZE, SQLITE_POOL_TIMEOUT,
+SQLITE_STATEMENT_CACHE_SIZE, or configure_pool().
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "users.db")
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+SQLITE_POOL_TIMEOUT = float(os.getenv("SQLITE_POOL_TIMEOUT", "30"))
+SQLITE_STATEMENT_CACHE_SIZE = int(os.getenv("SQLITE_STATEMENT_CACHE_SIZE", "128"))
+
+# Applied in this order to every new connection. cache_size is in KiB when
+# negative (16 MiB here); mmap_size in bytes.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+
+class StatementCache:
+    """
+    Bounded LRU of cursors keyed on SQL text and row_factory, one per
+    pooled connection (a cursor keeps the row_factory it was created with).
+
+    The compiled statements themselves live in sqlite3's per-connection
+    statement cache, which ConnectionPool sizes to match (cached_statements),
+    so a statement found here is executed without being parsed and planned
+    again; reusing its cursor saves creating one per call.
+
+    fetchone()/fetchall() leave the cursor reset and reusable. A cursor
+    handed out by execute() may still be mid-result: it is closed and
+    forgotten when the connection goes back to the pool (the compiled
+    statement stays cached). Like the connection itself, the cache is
+    used by one thread at a time.
+    """
+
+    def __init__(self, size=SQLITE_STATEMENT_CACHE_SIZE):
+        self.size = size
+        self._cursors = OrderedDict()  # (sql, row_factory) -> cursor
+        self._lent = set()             # keys of cursors returned by execute()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _cursor(self, conn, sql):
+        key = (sql, conn.row_factory)
+        cursor = self._cursors.get(key)
+        if cursor is not None:
+            self._cursors.move_to_end(key)
+            self.hits += 1
+            return key, cursor
+        self.misses += 1
+        cursor = self._cursors[key] = conn.cursor()
+        if len(self._cursors) > self.size:
+            oldest, evicted = self._cursors.popitem(last=False)
+            self._lent.discard(oldest)
+            evicted.close()
+            self.evictions += 1
+        return key, cursor
+
+    def execute(self, conn, sql, params=()):
+        """Execute `sql` on its cached cursor and return the cursor."""
+        key, cursor = self._cursor(conn, sql)
+        self._lent.add(key)
+        return cursor.execute(sql, params)
+
+    def fetchone(self, conn, sql, params=()):
+        """
+        First row of `sql`, or None. The statement is stepped once more so
+        a single-row result (key lookup) finishes and resets it; if more rows
+        follow, the cursor is closed instead of reading them.
+        """
+        key, cursor = self._cursor(conn, sql)
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+        if row is not None and cursor.fetchone() is not None:
+            del self._cursors[key]
+            self._lent.discard(key)
+            cursor.close()
+        return row
+
+    def fetchall(self, conn, sql, params=()):
+        """All rows of `sql`."""
+        return self._cursor(conn, sql)[1].execute(sql, params).fetchall()
+
+    def reset(self):
+        """Close the cursors lent out by execute() since the last reset."""
+        for key in self._lent:
+            cursor = self._cursors.pop(key, None)
+            if cursor is not None:
+                cursor.close()
+        self._lent.clear()
+
+    def clear(self):
+        for cursor in self._cursors.values():
+            cursor.close()
+        self._cursors.clear()
+        self._lent.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "cursors": len(self._cursors)}
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection handed out by ConnectionPool."""
+
+    statements = None  # StatementCache, set by the pool
+    pid = None         # process that opened it
+
+
+class ConnectionPool:
+    """
+    Up to `size` connections to `path`, each lent to one thread at a time.
+    `pragmas` is merged over DEFAULT_PRAGMAS (None skips a PRAGMA).
+    acquire() raises TimeoutError after `timeout` seconds without a free
+    connection.
+    """
+
+    def __init__(self, path=SQLITE_DB_PATH, size=SQLITE_POOL_SIZE,
+                 timeout=SQLITE_POOL_TIMEOUT, pragmas=None,
+                 statement_cache_size=SQLITE_STATEMENT_CACHE_SIZE):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self.statement_cache_size = statement_cache_size
+        self._idle = queue.LifoQueue()  # warmest connection on top
+        self._slots = threading.BoundedSemaphore(size)
+        self._open_conns = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {"borrows": 0, "creations": 0, "discards": 0, "timeouts": 0}
+        _pools.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _open(self):
+        # check_same_thread=False: a connection is used by one thread at a
+        # time, but not always the one that opened it.
+        conn = sqlite3.connect(self.path, timeout=self.timeout,
+                               check_same_thread=False,
+                               factory=PooledConnection,
+                               cached_statements=self.statement_cache_size)
+        conn.statements = StatementCache(self.statement_cache_size)
+        conn.pid = os.getpid()
+        try:
+            for name, value in self.pragmas.items():
+                if value is not None:
+                    conn.execute(f"PRAGMA {name} = {value}").fetchall()
+        except BaseException:
+            conn.close()
+            raise
+        self._open_conns.add(conn)
+        self._count("creations")
+        return conn
+
+    def _forget_parent(self):
+        # In a forked child: SQLite connections must not cross fork(), so
+        # the parent's are dropped without being used or closed.
+        _inherited.extend(self._open_conns)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._open_conns = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def _reset(self, conn):
+        """Undo what a borrower may have left behind on `conn`."""
+        conn.statements.reset()
+        if conn.in_transaction:
+            conn.rollback()
+        conn.set_trace_callback(None)
+        conn.set_progress_handler(None, 0)
+        conn.set_authorizer(None)
+        conn.row_factory = None
+        conn.text_factory = str
+        conn.isolation_level = ""
+
+    def acquire(self, timeout=None):
+        """Borrow a connection, opening one if none is idle."""
+        wait = self.timeout if timeout is None else timeout
+        if not self._slots.acquire(timeout=wait):
+            self._count("timeouts")
+            raise TimeoutError(f"No connection free after {wait:.1f}s (pool size {self.size})")
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                conn = self._open()
+            except BaseException:
+                self._slots.release()
+                raise
+        self._count("borrows")
+        return conn
+
+    def release(self, conn):
+        """Reset `conn` and make it available again (or close it)."""
+        if conn.pid != os.getpid():
+            return  # borrowed before a fork: it belongs to the parent
+        try:
+            self._reset(conn)
+            keep = not self._closed
+        except sqlite3.Error:
+            keep = False
+        if keep:
+            self._idle.put(conn)
+        else:
+            self._count("discards")
+            conn.close()
+        self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=self.size, idle=self._idle.qsize())
+
+    def statement_stats(self):
+        """Statement cache counters summed over the open connections."""
+        totals = {"hits": 0, "misses": 0, "evictions": 0, "cursors": 0}
+        for conn in list(self._open_conns):
+            for name, value in conn.statements.stats().items():
+                totals[name] += value
+        return totals
+
+    def close(self):
+        """Close the idle connections; borrowed ones close when released."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pools = weakref.WeakSet()
+# Connections inherited through fork() stay referenced so garbage
+# collection never closes the parent's SQLite handles from the child.
+_inherited = []
+
+
+def _after_fork_in_child():
+    global _pool_lock
+    _pool_lock = threading.Lock()
+    for pool in list(_pools):
+        pool._forget_parent()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def get_pool():
+    """The process-wide pool, created on first use from the SQLITE_* settings."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def configure_pool(**options):
+    """Replace the process-wide pool with ConnectionPool(**options)."""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, ConnectionPool(**options)
+    if old is not None:
+        old.close()
+    return _pool
+
+
+def _statements(conn):
+    return getattr(conn, "statements", None)
+
+
+def execute(conn, sql, params=()):
+    """
+    Execute `sql` on `conn` through its statement cache (pooled
+    connections) or a new cursor (any other connection); returns the cursor.
+    """
+    statements = _statements(conn)
+    if statements is None:
+        return conn.execute(sql, params)
+    return statements.execute(conn, sql, params)
+
+
+def fetchone(conn, sql, params=()):
+    """First row of `sql` on `conn` (see StatementCache.fetchone)."""
+    statements = _statements(conn)
+    if statements is None:
+        return conn.execute(sql, params).fetchone()
+    return statements.fetchone(conn, sql, params)
+
+
+def fetchall(conn, sql, params=()):
+    """All rows of `sql` on `conn`, reusing a cached cursor when pooled."""
+    statements = _statements(conn)
+    if statements is None:
+        return conn.execute(sql, params).fetchall()
+    return statements.fetchall(conn, sql, params)
@@ -0,0 +1,922 @@
+#!/usr/bin/env python3
+"""
+Query result cache used by the `cache_query` decorator (4-cache_query.py).
+
+QueryCache is a thread-safe LRU cache bounded both by number of entries
+and by the estimated size of the cached results, with a time-to-live per
+entry. Keys are built from the normalized SQL text plus the query
+parameters, so the same statement with different parameters gets its
+own entry and whitespace differences do not.
+
+Every entry is tagged with the tables its SELECT reads. Writes committed
+through the `transactional` decorator (2-transactional.py) call
+invalidate_tables() with the tables they touched, which drops only the
+entries that read one of them. default_cache is the process-wide
+instance shared by those decorators.
+
+Storage is pluggable (CacheBackend): QueryCache keeps results in this
+process, SQLiteCache shares them, and their invalidations, between
+processes through a SQLite file, with concurrent misses coalesced.
+
+Entries can outlive their TTL by up to `max_stale` seconds. Such a stale
+entry is still served by get_or_compute() when the caller provides a
+`refresh` function; the refresh then runs on a small background thread
+pool, so no caller waits on an expired key. Hot keys can also be
+refreshed ahead of expiry (see `refresh_ahead`).
+"""
+
+import abc
+import os
+import pickle
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Sentinel returned by QueryCache.get() on a miss (None is a valid result).
+MISS = object()
+
+_WHITESPACE_OR_LITERAL = re.compile(r"('(?:[^']|'')*')|\s+")
+
+
+def normalize_sql(query):
+    """
+    Collapse runs of whitespace outside string literals and drop a trailing
+    semicolon, so formatting differences map to the same cache key.
+    """
+    collapsed = _WHITESPACE_OR_LITERAL.sub(
+        lambda m: m.group(1) or " ", query
+    )
+    return collapsed.strip().rstrip(";").rstrip()
+
+
+def make_key(query, args=(), kwargs=None):
+    """
+    Build a cache key from the normalized SQL plus the positional and
+    keyword parameters passed alongside it.
+    """
+    params = (tuple(args), tuple(sorted((kwargs or {}).items())))
+    return repr((normalize_sql(query), params))
+
+
+# Table names after INSERT/REPLACE INTO, UPDATE, DELETE FROM (writes), and
+# the table lists after FROM/JOIN (reads, see tables_read); optional schema
+# prefix and quoting are allowed.
+_NAME = r'[`"\[]?([A-Za-z_][\w$]*)[`"\]]?(?:\s*\.\s*[`"\[]?([A-Za-z_][\w$]*)[`"\]]?)?'
+_FROM_OR_JOIN = re.compile(r"\b(?:FROM|JOIN)\b", re.IGNORECASE)
+_TABLE_NAME = re.compile(r"\s*" + _NAME)
+_ALIAS = re.compile(r"\s+(?:AS\s+)?([A-Za-z_]\w*)", re.IGNORECASE)
+_NEXT_WORD = re.compile(r"\s*([A-Za-z_]+)")
+_SPACE = re.compile(r"\s*")
+# Words that can follow an item of a FROM list (so are not aliases).
+_CLAUSE_WORDS = {
+    "WHERE", "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "NATURAL",
+    "OUTER", "ON", "USING", "GROUP", "ORDER", "HAVING", "LIMIT", "OFFSET",
+    "UNION", "EXCEPT", "INTERSECT", "WINDOW", "INDEXED", "NOT", "RETURNING",
+}
+_WRITE_TABLE = re.compile(
+    r"\b(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+"
+    + _NAME,
+    re.IGNORECASE,
+)
+_WRITE_VERB = re.compile(r"^\s*(?:WITH\b.*?\)\s*)?(INSERT|REPLACE|UPDATE|DELETE)\b",
+                         re.IGNORECASE | re.DOTALL)
+_DDL_VERB = re.compile(r"^\s*(?:CREATE|DROP|ALTER)\b", re.IGNORECASE)
+
+# Tag for entries whose tables could not be determined: any write drops them.
+# As a written table it means "unknown / schema change": drop everything.
+ANY_TABLE = "*"
+_EVERYTHING = "**"
+
+
+def _strip_literals(sql):
+    return re.sub(r"'(?:[^']|'')*'", "''", sql)
+
+
+def _table_names(pattern, sql):
+    return {
+        (table or schema_or_table).lower()
+        for schema_or_table, table in pattern.findall(_strip_literals(sql))
+    }
+
+
+def _skip_parens(sql, pos):
+    # sql[pos] is "("; returns the index after its matching ")", or -1.
+    depth = 0
+    for i in range(pos, len(sql)):
+        if sql[i] == "(":
+            depth += 1
+        elif sql[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return -1
+
+
+def tables_read(query):
+    """
+    Return the lower-cased names of the tables a SELECT reads: every item
+    of the comma-separated lists after FROM, plus JOINed tables (aliases
+    allowed; subqueries are scanned through their own FROM). If a FROM
+    list cannot be parsed, returns {ANY_TABLE} rather than a partial set.
+    """
+    sql = _strip_literals(query)
+    tables = set()
+    for keyword in _FROM_OR_JOIN.finditer(sql):
+        pos = keyword.end()
+        while True:
+            start = _SPACE.match(sql, pos).end()
+            if sql.startswith("(", start):
+                pos = _skip_parens(sql, start)
+                if pos < 0:
+                    return {ANY_TABLE}
+            else:
+                name = _TABLE_NAME.match(sql, start)
+                if name is None or sql.startswith("(", _SPACE.match(sql, name.end()).end()):
+                    return {ANY_TABLE}  # not a table, e.g. a table-valued function
+                schema_or_table, table = name.groups()
+                tables.add((table or schema_or_table).lower())
+                pos = name.end()
+            alias = _ALIAS.match(sql, pos)
+            if alias is not None and alias.group(1).upper() not in _CLAUSE_WORDS:
+                pos = alias.end()
+            pos = _SPACE.match(sql, pos).end()
+            if sql.startswith(",", pos):
+                pos += 1
+                continue
+            word = _NEXT_WORD.match(sql, pos)
+            if pos == len(sql) or sql[pos] in ");" or (
+                word is not None and word.group(1).upper() in _CLAUSE_WORDS
+            ):
+                break
+            return {ANY_TABLE}
+    return tables
+
+
+def tables_written(statement):
+    """
+    Return the lower-cased names of the tables a statement writes.
+    DDL (CREATE/DROP/ALTER) is reported as ANY_TABLE; reads return an
+    empty set.
+    """
+    if _DDL_VERB.match(statement):
+        return {ANY_TABLE}
+    if not _WRITE_VERB.match(statement):
+        return set()
+    return _table_names(_WRITE_TABLE, statement) or {ANY_TABLE}
+
+
+def estimate_size(value):
+    """
+    Rough size in bytes of a query result (lists/tuples of rows of
+    scalars), used to bound the cache by memory.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return size
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the
+    function, callers arriving while it runs wait and get its result, or
+    its exception. Nothing is remembered once the call finishes.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.value = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Return (fn() result, True if this caller ran fn)."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, False
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, True
+
+
+class CacheBackend(abc.ABC):
+    """
+    Interface of the stores `cache_query` can use.
+
+    A backend maps keys (see make_key) to query results, tags each entry
+    with the tables it reads, and drops entries on invalidate_tables().
+    QueryCache keeps entries in this process; SQLiteCache shares them
+    between processes through a SQLite file. Concurrent misses on a key
+    within the process are single-flighted: one thread computes, the
+    others wait for its result. Subclasses must implement every abstract
+    method; an incomplete backend cannot be instantiated.
+    """
+
+    def __init__(self, refresh_workers=4):
+        self._flights = SingleFlight()
+        self.refresh_workers = refresh_workers
+        self._refresher = None
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    @abc.abstractmethod
+    def get(self, key, count=True):
+        """
+        Return the cached value for `key`, or MISS. count=False leaves the
+        hit/miss counters alone. Stale entries are misses here.
+        """
+
+    @abc.abstractmethod
+    def lookup(self, key, count=True):
+        """
+        Return (value, remaining, hits) for `key`, or MISS. `remaining` is
+        the number of seconds until the entry expires (None = never); it
+        is negative for an expired entry still inside its max_stale
+        window. `hits` is how often the entry has been read (None if the
+        backend does not track it).
+        """
+
+    @abc.abstractmethod
+    def set(self, key, value, ttl=None, tables=(), version=None, max_stale=0):
+        """Cache `value` (see QueryCache.set for the arguments)."""
+
+    @abc.abstractmethod
+    def version(self, tables):
+        """Invalidation snapshot for a query reading `tables`."""
+
+    @abc.abstractmethod
+    def invalidate_tables(self, tables):
+        """Drop the entries reading any of `tables`."""
+
+    @abc.abstractmethod
+    def delete(self, key):
+        """Drop the entry for `key`, if any."""
+
+    @abc.abstractmethod
+    def clear(self):
+        """Drop every entry."""
+
+    @abc.abstractmethod
+    def stats(self):
+        """Return the backend's counters and occupancy as a dict."""
+
+    def get_or_compute(self, key, compute, ttl=None, tables=(), max_stale=0,
+                       refresh=None, refresh_ahead=0, hot_hits=2):
+        """
+        Return (value, computed): the cached value for `key`, or the result
+        of compute(), which is then cached. Concurrent misses on the same
+        key share one compute() call; if it raises, every waiting caller
+        gets the exception and nothing is cached.
+
+        With a `refresh` function (which must not depend on the caller's
+        resources, e.g. it opens its own connection), an expired entry
+        kept by max_stale is returned as is and refresh() runs in the
+        background to replace it. An entry read at least `hot_hits` times
+        is also refreshed in the background once less than
+        `refresh_ahead` seconds of its TTL remain.
+        """
+        if refresh is None:
+            value = self.get(key)
+            if value is not MISS:
+                return value, False
+        else:
+            found = self.lookup(key)
+            if found is not MISS:
+                value, remaining, hits = found
+                if remaining is not None and (
+                    remaining <= 0
+                    or (remaining < refresh_ahead and (hits is None or hits >= hot_hits))
+                ):
+                    self.refresh_in_background(key, refresh, ttl, tables, max_stale)
+                return value, False
+        return self._compute_missing(key, compute, ttl, tables, max_stale)
+
+    def _compute_missing(self, key, compute, ttl, tables, max_stale):
+        def load():
+            # A flight for this key may have finished since our miss.
+            cached = self.get(key, count=False)
+            if cached is not MISS:
+                return cached, False
+            version = self.version(tables)
+            result = compute()
+            self.set(key, result, ttl, tables=tables, version=version,
+                     max_stale=max_stale)
+            return result, True
+
+        (value, computed), leader = self._flights.do(key, load)
+        return value, computed and leader
+
+    def refresh_in_background(self, key, refresh, ttl=None, tables=(), max_stale=0):
+        """
+        Recompute the entry for `key` with refresh() on the refresh pool.
+        Returns False if a refresh of that key is already pending.
+        """
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return False
+            if self._refresher is None:
+                self._refresher = ThreadPoolExecutor(
+                    max_workers=self.refresh_workers,
+                    thread_name_prefix="query-cache-refresh",
+                )
+            self._refreshing.add(key)
+        try:
+            self._refresher.submit(self._refresh, key, refresh, ttl, tables, max_stale)
+        except RuntimeError:  # pool shut down
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+            return False
+        return True
+
+    def _refresh(self, key, refresh, ttl, tables, max_stale):
+        def load():
+            version = self.version(tables)
+            result = refresh()
+            self.set(key, result, ttl, tables=tables, version=version,
+                     max_stale=max_stale)
+            return result, True
+
+        try:
+            if self._run_refresh(key, load):
+                self._count_refresh("refreshes")
+        except Exception as e:
+            # The stale value stays until max_stale runs out; the next
+            # read schedules another attempt.
+            self._count_refresh("refresh_errors")
+            print(f"Background refresh failed for {key}: {e}")
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+
+    def _run_refresh(self, key, load):
+        # Shares the key's flight, so a concurrent miss does not run the
+        # query a second time. Returns False if the refresh was skipped.
+        self._flights.do(key, load)
+        return True
+
+    def _count_refresh(self, name):
+        with self._refresh_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def shutdown(self, wait=True):
+        """Stop the refresh pool (pending refreshes finish if wait=True)."""
+        with self._refresh_lock:
+            refresher, self._refresher = self._refresher, None
+        if refresher is not None:
+            refresher.shutdown(wait=wait)
+
+
+class _Entry:
+    """One QueryCache entry."""
+
+    __slots__ = ("value", "size", "expires_at", "stale_until", "tables", "hits")
+
+    def __init__(self, value, size, expires_at, stale_until, tables):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at    # monotonic time, None = no expiry
+        self.stale_until = stale_until  # expires_at + max_stale
+        self.tables = tables
+        self.hits = 0
+
+
+class QueryCache(CacheBackend):
+    """
+    In-process LRU cache of query results with per-entry TTL.
+
+    Args:
+        max_entries (int): Maximum number of cached results.
+        max_bytes (int): Maximum total estimated size of cached results.
+        ttl (float): Default time-to-live in seconds (None = no expiry).
+        refresh_workers (int): Threads running background refreshes.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, ttl=300,
+                 refresh_workers=4):
+        super().__init__(refresh_workers)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> _Entry
+        self._by_table = {}            # table -> set of keys reading it
+        self._versions = {}            # table -> invalidation count
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, count=False) is not MISS
+
+    def _find(self, key, now):
+        # Caller holds the lock. Drops the entry once it is past max_stale.
+        entry = self._entries.get(key)
+        if entry is not None and entry.stale_until is not None and entry.stale_until <= now:
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+        return entry
+
+    def get(self, key, count=True):
+        """Return the cached value for `key`, or MISS."""
+        with self._lock:
+            now = time.monotonic()
+            entry = self._find(key, now)
+            if entry is None or (entry.expires_at is not None and entry.expires_at <= now):
+                if count:
+                    self.misses += 1
+                return MISS
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            if count:
+                self.hits += 1
+            return entry.value
+
+    def lookup(self, key, count=True):
+        """Return (value, remaining, hits) for `key`, or MISS (see CacheBackend)."""
+        with self._lock:
+            now = time.monotonic()
+            entry = self._find(key, now)
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return MISS
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            remaining = None if entry.expires_at is None else entry.expires_at - now
+            if count:
+                if remaining is not None and remaining <= 0:
+                    self.stale_hits += 1
+                else:
+                    self.hits += 1
+            return entry.value, remaining, entry.hits
+
+    def version(self, tables):
+        """
+        Snapshot of the invalidation counters relevant to a query reading
+        `tables`. Take it before running the query and pass it to set():
+        if a write touched one of the tables in between, the (possibly
+        stale) result is not cached.
+        """
+        tables = set(tables) or {ANY_TABLE}
+        with self._lock:
+            return {t: self._versions.get(t, 0) for t in tables | {_EVERYTHING}}
+
+    def set(self, key, value, ttl=None, tables=(), version=None, max_stale=0):
+        """
+        Cache `value` under `key` for `ttl` seconds (default: self.ttl),
+        tagged with the `tables` it was read from (ANY_TABLE if unknown).
+        The entry is kept `max_stale` more seconds after it expires, for
+        stale-while-revalidate reads. Results larger than max_bytes on
+        their own are not cached.
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        tables = frozenset(tables) or frozenset({ANY_TABLE})
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        stale_until = expires_at + max_stale if expires_at is not None else None
+        with self._lock:
+            if version is not None and any(
+                self._versions.get(t, 0) != v for t, v in version.items()
+            ):
+                return
+            hits = 0
+            if key in self._entries:
+                hits = self._entries[key].hits
+                self._remove(key)
+            entry = self._entries[key] = _Entry(value, size, expires_at, stale_until, tables)
+            entry.hits = hits  # a refreshed key stays hot
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_tables(self, tables):
+        """
+        Drop every entry that reads one of `tables`, plus the entries whose
+        tables are unknown. ANY_TABLE among `tables` drops everything.
+        Returns the number of entries dropped.
+        """
+        tables = {t.lower() for t in tables}
+        if not tables:
+            return 0
+        with self._lock:
+            if ANY_TABLE in tables:
+                self._bump(_EVERYTHING)
+                keys = set(self._entries)
+            else:
+                tables.add(ANY_TABLE)
+                keys = set()
+                for table in tables:
+                    self._bump(table)
+                    keys |= self._by_table.get(table, set())
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def _bump(self, table):
+        self._versions[table] = self._versions.get(table, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for table in entry.tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current occupancy."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "coalesced": self._flights.coalesced,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache shared by every process that opens the same SQLite file.
+
+    Results are pickled into the file, so a worker can reuse what
+    another worker computed. Invalidations go through the same file and
+    are seen by all workers at once. A miss takes a lease on the key
+    before computing; other processes that miss on that key wait for
+    the value instead of running the query themselves. Background
+    refreshes take the same lease, so one process refreshes a stale key.
+    Entries are evicted oldest-first beyond max_entries (a read never
+    writes, so hits stay cheap under concurrency; for the same reason
+    per-entry hits are not tracked and refresh_ahead applies to every
+    key read close to expiry).
+
+    Args:
+        path (str): Cache database file.
+        max_entries (int): Maximum number of cached results.
+        ttl (float): Default time-to-live in seconds (None = no expiry).
+        lease_ttl (float): Seconds a computing process may hold a key
+            before others stop waiting for it.
+        refresh_workers (int): Threads running background refreshes.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY, value BLOB NOT NULL,
+        expires_at REAL, stale_until REAL, created_at REAL NOT NULL);
+    CREATE INDEX IF NOT EXISTS entries_created ON entries (created_at);
+    CREATE TABLE IF NOT EXISTS entry_tables (
+        key TEXT NOT NULL, tbl TEXT NOT NULL, PRIMARY KEY (tbl, key));
+    CREATE INDEX IF NOT EXISTS entry_tables_key ON entry_tables (key);
+    CREATE TABLE IF NOT EXISTS versions (tbl TEXT PRIMARY KEY, v INTEGER NOT NULL);
+    CREATE TABLE IF NOT EXISTS leases (
+        key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL);
+    """
+
+    def __init__(self, path, max_entries=1024, ttl=300, lease_ttl=30,
+                 poll_interval=0.01, refresh_workers=4):
+        super().__init__(refresh_workers)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.evictions = 0
+        self.invalidations = 0
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+        if "stale_until" not in columns:  # file written by an older version
+            conn.execute("ALTER TABLE entries ADD COLUMN stale_until REAL")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def get(self, key, count=True):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            if count:
+                self._count("misses")
+            return MISS
+        if count:
+            self._count("hits")
+        return pickle.loads(row[0])
+
+    def lookup(self, key, count=True):
+        row = self._conn().execute(
+            "SELECT value, expires_at, COALESCE(stale_until, expires_at) "
+            "FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or (row[2] is not None and row[2] <= now):
+            if count:
+                self._count("misses")
+            return MISS
+        remaining = None if row[1] is None else row[1] - now
+        if count:
+            stale = remaining is not None and remaining <= 0
+            self._count("stale_hits" if stale else "hits")
+        return pickle.loads(row[0]), remaining, None
+
+    def __contains__(self, key):
+        return self.get(key, count=False) is not MISS
+
+    def version(self, tables):
+        tables = sorted(set(tables) or {ANY_TABLE}) + [_EVERYTHING]
+        marks = ",".join("?" * len(tables))
+        found = dict(self._conn().execute(
+            f"SELECT tbl, v FROM versions WHERE tbl IN ({marks})", tables
+        ).fetchall())
+        return {t: found.get(t, 0) for t in tables}
+
+    def set(self, key, value, ttl=None, tables=(), version=None, max_stale=0):
+        tables = set(tables) or {ANY_TABLE}
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        stale_until = expires_at + max_stale if expires_at is not None else None
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version is not None and self._changed_since(conn, version):
+                conn.execute("ROLLBACK")
+                return
+            conn.execute("DELETE FROM entry_tables WHERE key = ?", (key,))
+            conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, value, expires_at, stale_until, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, blob, expires_at, stale_until, now),
+            )
+            conn.executemany(
+                "INSERT INTO entry_tables (key, tbl) VALUES (?, ?)",
+                [(key, t) for t in tables],
+            )
+            evicted = self._evict(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if evicted:
+            self._count("evictions", evicted)
+
+    def _changed_since(self, conn, version):
+        marks = ",".join("?" * len(version))
+        current = dict(conn.execute(
+            f"SELECT tbl, v FROM versions WHERE tbl IN ({marks})", list(version)
+        ).fetchall())
+        return any(current.get(t, 0) != v for t, v in version.items())
+
+    def _evict(self, conn):
+        (count,) = conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        victims = [k for (k,) in conn.execute(
+            "SELECT key FROM entries ORDER BY created_at LIMIT ?", (excess,)
+        )]
+        self._delete_keys(conn, victims)
+        return len(victims)
+
+    def _delete_keys(self, conn, keys):
+        conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in keys])
+        conn.executemany("DELETE FROM entry_tables WHERE key = ?", [(k,) for k in keys])
+
+    def invalidate_tables(self, tables):
+        tables = {t.lower() for t in tables}
+        if not tables:
+            return 0
+        bump = [_EVERYTHING] if ANY_TABLE in tables else sorted(tables | {ANY_TABLE})
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO versions (tbl, v) VALUES (?, 1) "
+                "ON CONFLICT (tbl) DO UPDATE SET v = v + 1",
+                [(t,) for t in bump],
+            )
+            if ANY_TABLE in tables:
+                keys = [k for (k,) in conn.execute("SELECT key FROM entries")]
+            else:
+                marks = ",".join("?" * len(bump))
+                keys = [k for (k,) in conn.execute(
+                    f"SELECT DISTINCT key FROM entry_tables WHERE tbl IN ({marks})", bump
+                )]
+            self._delete_keys(conn, keys)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._count("invalidations", len(keys))
+        return len(keys)
+
+    def delete(self, key):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        self._delete_keys(conn, [key])
+        conn.execute("COMMIT")
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM entries")
+        conn.execute("DELETE FROM entry_tables")
+        conn.execute("COMMIT")
+
+    def _try_lease(self, key, owner):
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, "
+            "expires_at = excluded.expires_at WHERE leases.expires_at <= ?",
+            (key, owner, now + self.lease_ttl, now),
+        )
+        return cur.rowcount == 1
+
+    def _release_lease(self, key, owner):
+        self._conn().execute(
+            "DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner)
+        )
+
+    def _compute_missing(self, key, compute, ttl, tables, max_stale):
+        """
+        Coalesced across processes too: threads of this process
+        single-flight first, then only the lease holder runs compute();
+        other processes poll for its result until the lease is released
+        or expires, then try again themselves.
+        """
+        (value, computed), leader = self._flights.do(
+            key,
+            lambda: self._get_or_compute_leased(key, compute, ttl, tables, max_stale),
+        )
+        return value, computed and leader
+
+    def _get_or_compute_leased(self, key, compute, ttl, tables, max_stale):
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        waited = False
+        while True:
+            value = self.get(key, count=False)
+            if value is not MISS:
+                return value, False
+            if self._try_lease(key, owner):
+                # Another process may have stored the key between our
+                # get() and the lease: use its value rather than rerun.
+                value = self.get(key, count=False)
+                if value is not MISS:
+                    self._release_lease(key, owner)
+                    return value, False
+                break
+            if not waited:
+                waited = True
+                self._count("waits")
+            time.sleep(self.poll_interval)
+        try:
+            version = self.version(tables)
+            value = compute()
+            self.set(key, value, ttl, tables=tables, version=version,
+                     max_stale=max_stale)
+            return value, True
+        finally:
+            self._release_lease(key, owner)
+
+    def _run_refresh(self, key, load):
+        # Only the lease, not the flight: a miss on this key in any
+        # process, this one included, waits on the lease. If someone
+        # else holds it the key is already being computed.
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        if not self._try_lease(key, owner):
+            return False
+        try:
+            load()
+            return True
+        finally:
+            self._release_lease(key, owner)
+
+    def stats(self):
+        (entries,) = self._conn().execute("SELECT COUNT(*) FROM entries").fetchone()
+        with self._stats_lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "waits": self.waits,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "coalesced": self._flights.coalesced,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "entries": entries,
+            }
+
+
+def _cache_from_env():
+    """
+    Build the default cache from QUERY_CACHE_BACKEND:
+    unset or "memory" -> QueryCache, "sqlite:<path>" -> SQLiteCache.
+    """
+    spec = os.environ.get("QUERY_CACHE_BACKEND", "memory")
+    if spec.startswith("sqlite:"):
+        return SQLiteCache(spec[len("sqlite:"):])
+    if spec != "memory":
+        raise ValueError(f"Unknown QUERY_CACHE_BACKEND: {spec!r}")
+    return QueryCache()
+
+
+# Process-wide cache shared by cache_query and transactional. Set
+# QUERY_CACHE_BACKEND=sqlite:/path/cache.db in every worker to share it
+# across processes, or call set_default_cache() at startup.
+default_cache = _cache_from_env()
+
+
+def get_default_cache():
+    """Return the process-wide cache backend."""
+    return default_cache
+
+
+def set_default_cache(backend):
+    """Replace the process-wide cache backend (a CacheBackend)."""
+    global default_cache
+    default_cache = backend
+    return backend
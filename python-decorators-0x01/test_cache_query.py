@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Unit tests for the cache_query decorator (4-cache_query.py).
+
+Covers:
+- single-flight: N concurrent identical misses run the query once
+- errors are propagated to every waiting caller and not cached
+- stale-while-revalidate: expired results are served while a background
+  refresh replaces them, within max_stale
+- table tagging: every table a SELECT reads is found, or the entry is
+  tagged as reading any table
+"""
+
+import importlib
+import threading
+import time
+import unittest
+
+from query_cache import ANY_TABLE, QueryCache, tables_read
+
+cache_query = importlib.import_module("4-cache_query").cache_query
+
+THREADS = 32
+
+
+def run_concurrently(func, n=THREADS):
+    """Call func() from n threads released at the same moment."""
+    barrier = threading.Barrier(n)
+    results = [None] * n
+    errors = [None] * n
+
+    def call(i):
+        barrier.wait()
+        try:
+            results[i] = func()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Concurrent misses on one key are coalesced into one execution."""
+
+    def test_one_execution_for_concurrent_misses(self):
+        """N threads asking for the same uncached query hit the DB once."""
+        executions = []
+        cache = QueryCache()
+
+        @cache_query(cache=cache)
+        def fetch(conn, query):
+            executions.append(query)
+            time.sleep(0.2)  # keep the query in flight while others arrive
+            return [(1, "Alice")]
+
+        results, errors = run_concurrently(lambda: fetch(None, "SELECT * FROM users"))
+
+        self.assertEqual(len(executions), 1)
+        self.assertEqual(errors, [None] * THREADS)
+        self.assertEqual(results, [[(1, "Alice")]] * THREADS)
+        self.assertGreater(cache.stats()["coalesced"], 0)
+
+    def test_errors_propagate_and_are_not_cached(self):
+        """Every waiter sees the leader's error; the next call retries."""
+        executions = []
+        cache = QueryCache()
+
+        @cache_query(cache=cache)
+        def fetch(conn, query):
+            executions.append(query)
+            time.sleep(0.2)
+            if len(executions) == 1:
+                raise RuntimeError("database is locked")
+            return [(1, "Alice")]
+
+        results, errors = run_concurrently(lambda: fetch(None, "SELECT * FROM users"))
+
+        self.assertEqual(len(executions), 1)
+        failed = [e for e in errors if e is not None]
+        self.assertTrue(failed)
+        self.assertTrue(all(isinstance(e, RuntimeError) for e in failed))
+        self.assertEqual(len(cache), 0)
+
+        self.assertEqual(fetch(None, "SELECT * FROM users"), [(1, "Alice")])
+        self.assertEqual(len(executions), 2)
+
+
+class FakeConnection:
+    """Stands in for the connection a background refresh opens."""
+
+    def close(self):
+        pass
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestStaleWhileRevalidate(unittest.TestCase):
+    """Expired entries are served stale and refreshed in the background."""
+
+    def setUp(self):
+        self.cache = QueryCache()
+        self.executions = []
+
+        @cache_query(cache=self.cache, ttl=0.05, max_stale=5, connect=FakeConnection)
+        def fetch(conn, query):
+            self.executions.append(conn)
+            time.sleep(0.05)
+            return len(self.executions)
+
+        self.fetch = fetch
+
+    def tearDown(self):
+        self.cache.shutdown()
+
+    def test_expired_result_served_while_refreshing(self):
+        """The first read after expiry returns the old value at once."""
+        self.assertEqual(self.fetch(None, "SELECT * FROM users"), 1)
+        time.sleep(0.1)
+
+        started = time.monotonic()
+        self.assertEqual(self.fetch(None, "SELECT * FROM users"), 1)
+        self.assertLess(time.monotonic() - started, 0.05)
+
+        self.assertTrue(wait_for(lambda: self.cache.stats()["refreshes"] == 1))
+        self.assertEqual(self.fetch(None, "SELECT * FROM users"), 2)
+        self.assertIsInstance(self.executions[1], FakeConnection)
+
+    def test_concurrent_stale_reads_refresh_once(self):
+        """Many readers of one stale key schedule a single refresh."""
+        self.fetch(None, "SELECT * FROM users")
+        time.sleep(0.1)
+
+        results, errors = run_concurrently(lambda: self.fetch(None, "SELECT * FROM users"))
+
+        self.assertEqual(errors, [None] * THREADS)
+        self.assertEqual(set(results), {1})
+        self.assertTrue(wait_for(lambda: self.cache.stats()["refreshes"] == 1))
+        self.assertEqual(len(self.executions), 2)
+
+    def test_past_max_stale_is_a_miss(self):
+        """Beyond max_stale the caller waits for the query again."""
+        cache = QueryCache()
+        executions = []
+
+        @cache_query(cache=cache, ttl=0.01, max_stale=0.05, connect=FakeConnection)
+        def fetch(conn, query):
+            executions.append(conn)
+            return len(executions)
+
+        self.assertEqual(fetch(None, "SELECT * FROM users"), 1)
+        time.sleep(0.1)
+        self.assertEqual(fetch(None, "SELECT * FROM users"), 2)
+        self.assertIsNone(executions[1])  # ran in the caller, not a refresh
+        cache.shutdown()
+
+    def test_hot_entry_refreshed_ahead_of_expiry(self):
+        """A hot key close to expiry is refreshed before it goes stale."""
+        cache = QueryCache()
+        executions = []
+
+        @cache_query(cache=cache, ttl=0.3, refresh_ahead=0.2, hot_hits=2,
+                     connect=FakeConnection)
+        def fetch(conn, query):
+            executions.append(conn)
+            return len(executions)
+
+        fetch(None, "SELECT * FROM users")
+        fetch(None, "SELECT * FROM users")
+        time.sleep(0.15)
+        self.assertEqual(fetch(None, "SELECT * FROM users"), 1)
+        self.assertTrue(wait_for(lambda: cache.stats()["refreshes"] == 1))
+        self.assertEqual(fetch(None, "SELECT * FROM users"), 2)
+        cache.shutdown()
+
+
+class TestTablesRead(unittest.TestCase):
+    """A write to any table a query reads invalidates its entry."""
+
+    def test_comma_join(self):
+        query = "SELECT u.name, o.id FROM users u, orders o WHERE u.id = o.user_id"
+        self.assertEqual(tables_read(query), {"users", "orders"})
+
+    def test_subquery_in_from_list(self):
+        query = "SELECT * FROM (SELECT id FROM users) s, orders AS o JOIN items i ON 1"
+        self.assertEqual(tables_read(query), {"users", "orders", "items"})
+
+    def test_unparsable_from_reads_any_table(self):
+        self.assertEqual(tables_read("SELECT * FROM json_each(?)"), {ANY_TABLE})
+
+    def test_write_to_comma_joined_table_invalidates(self):
+        cache = QueryCache()
+        query = "SELECT u.name, o.id FROM users u, orders o"
+        cache.set("k", [("Alice", 1)], tables=tables_read(query))
+        cache.invalidate_tables({"orders"})
+        self.assertNotIn("k", cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
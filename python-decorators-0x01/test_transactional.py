@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Unit tests for batched transactional calls (2-transactional.py).
+
+Covers:
+- every call of a batch gets a Future resolved once its write commits
+- a failing call is rejected while the others of its batch commit
+- named (:name) and positional parameters are both written as given
+- cache entries reading a written table are dropped after the commit,
+  and a failing invalidation never leaves a committed Future pending
+- GroupCommitWriter: flush() waits for the queued calls, close() writes
+  what is left, a closed writer refuses work, and a stopping writer
+  settles whatever is still queued
+"""
+
+import importlib
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import db_pool
+import query_cache
+from query_cache import MISS, QueryCache
+
+transactional_module = importlib.import_module("2-transactional")
+GroupCommitWriter = transactional_module.GroupCommitWriter
+batch = transactional_module.batch
+transactional = transactional_module.transactional
+with_db_connection = transactional_module.with_db_connection
+
+
+@with_db_connection
+@transactional
+def set_email(conn, user_id, email):
+    conn.execute("UPDATE users SET email = ? WHERE id = ?", (email, user_id))
+    return user_id
+
+
+@with_db_connection
+@transactional
+def set_email_named(conn, user_id, email):
+    conn.execute("UPDATE users SET email = :e WHERE id = :i", {"i": user_id, "e": email})
+    return user_id
+
+
+@with_db_connection
+@transactional
+def add_user(conn, user_id, name):
+    conn.execute("INSERT INTO users (id, name, email) VALUES (?, ?, ?)",
+                 (user_id, name, f"{name}@example.com"))
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Points the process-wide pool at a fresh users.db with three users."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "users.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT NOT NULL, email TEXT)")
+        conn.executemany("INSERT INTO users (id, name, email) VALUES (?, ?, ?)",
+                         [(i, f"user{i}", f"user{i}@example.com") for i in (1, 2, 3)])
+        conn.commit()
+        conn.close()
+        db_pool.configure_pool(path=self.path, size=2)
+        self.saved_cache = query_cache.get_default_cache()
+        self.cache = query_cache.set_default_cache(QueryCache())
+
+    def tearDown(self):
+        query_cache.set_default_cache(self.saved_cache)
+        db_pool.configure_pool().close()
+        self.tmp_dir.cleanup()
+
+    def email(self, user_id):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute("SELECT email FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+        finally:
+            conn.close()
+
+
+class TestBatch(DatabaseTestCase):
+    """Calls made in a `with batch():` block are written when it ends."""
+
+    def test_futures_resolve_after_commit(self):
+        """Nothing is written inside the block; every Future resolves after it."""
+        with batch():
+            futures = [set_email(user_id=i, email=f"new{i}@example.com") for i in (1, 2, 3)]
+            self.assertEqual(self.email(1), "user1@example.com")
+            self.assertFalse(any(f.done() for f in futures))
+        self.assertEqual([f.result(timeout=2) for f in futures], [1, 2, 3])
+        self.assertEqual(self.email(3), "new3@example.com")
+
+    def test_failing_call_is_rejected_others_commit(self):
+        """A constraint violation rejects only its own call."""
+        with batch() as pending:
+            ok = set_email(user_id=1, email="ok@example.com")
+            bad = add_user(user_id=2, name="duplicate")
+            later = add_user(user_id=4, name="user4")
+        self.assertIsInstance(bad.exception(timeout=2), sqlite3.IntegrityError)
+        self.assertEqual(ok.result(timeout=2), 1)
+        self.assertIsNone(later.result(timeout=2))
+        self.assertEqual(self.email(1), "ok@example.com")
+        self.assertEqual(self.email(4), "user4@example.com")
+        self.assertEqual((pending.committed, pending.rejected, pending.fallbacks), (2, 1, 1))
+
+    def test_named_parameters(self):
+        """:name placeholders are bound by name, also next to positional calls."""
+        with batch():
+            futures = [
+                set_email_named(user_id=1, email="named1@example.com"),
+                set_email_named(user_id=2, email="named2@example.com"),
+                set_email(user_id=3, email="positional3@example.com"),
+            ]
+        self.assertEqual([f.result(timeout=2) for f in futures], [1, 2, 3])
+        self.assertEqual(self.email(1), "named1@example.com")
+        self.assertEqual(self.email(2), "named2@example.com")
+        self.assertEqual(self.email(3), "positional3@example.com")
+
+
+class LockedCache(QueryCache):
+    """QueryCache whose invalidation fails, like a busy SQLiteCache."""
+
+    def invalidate_tables(self, tables):
+        raise sqlite3.OperationalError("database is locked")
+
+
+class TestInvalidation(DatabaseTestCase):
+    """Committed batches invalidate the cached reads of the written tables."""
+
+    def test_group_commit_invalidates_written_tables(self):
+        self.cache.set("users", ["cached"], tables={"users"})
+        self.cache.set("orders", ["cached"], tables={"orders"})
+        with batch():
+            future = set_email(user_id=1, email="new1@example.com")
+        future.result(timeout=2)
+        self.assertIs(self.cache.get("users"), MISS)
+        self.assertEqual(self.cache.get("orders"), ["cached"])
+
+    def test_failed_invalidation_resolves_futures_and_clears(self):
+        """The write is committed, so its Future resolves; the cache is cleared."""
+        cache = query_cache.set_default_cache(LockedCache())
+        cache.set("orders", ["cached"], tables={"orders"})
+        with batch():
+            future = set_email(user_id=1, email="new1@example.com")
+        self.assertEqual(future.result(timeout=2), 1)
+        self.assertEqual(self.email(1), "new1@example.com")
+        self.assertIs(cache.get("orders"), MISS)
+
+
+class TestGroupCommitWriter(DatabaseTestCase):
+    """Write-behind through one writer thread."""
+
+    def setUp(self):
+        super().setUp()
+        self.writer = GroupCommitWriter(flush_interval=0.01, durable=False, path=self.path)
+
+    def tearDown(self):
+        self.writer.close()
+        super().tearDown()
+
+    def test_flush_waits_for_queued_calls(self):
+        futures = [self.writer.enqueue(set_email, user_id=i, email=f"wb{i}@example.com")
+                   for i in (1, 2, 3)]
+        self.writer.flush(timeout=2)
+        self.assertTrue(all(f.done() for f in futures))
+        self.assertEqual(self.email(2), "wb2@example.com")
+
+    def test_failing_call_is_rejected_others_commit(self):
+        ok = self.writer.enqueue(set_email, user_id=1, email="ok@example.com")
+        bad = self.writer.enqueue(add_user, user_id=3, name="duplicate")
+        self.writer.flush(timeout=2)
+        self.assertIsInstance(bad.exception(timeout=2), sqlite3.IntegrityError)
+        self.assertEqual(ok.result(timeout=2), 1)
+
+    def test_close_writes_what_is_queued(self):
+        futures = [self.writer.enqueue(set_email, user_id=i, email=f"wb{i}@example.com")
+                   for i in (1, 2, 3)]
+        self.writer.close(timeout=2)
+        self.assertEqual([f.result(timeout=0) for f in futures], [1, 2, 3])
+        self.assertEqual(self.email(3), "wb3@example.com")
+
+    def test_closed_writer_refuses_work(self):
+        self.writer.close(timeout=2)
+        with self.assertRaises(RuntimeError):
+            self.writer.flush(timeout=2)
+        with self.assertRaises(RuntimeError):
+            self.writer.enqueue(set_email, user_id=1, email="late@example.com")
+
+    def test_stopping_writer_settles_leftovers(self):
+        """Items found behind the stop marker are failed or resolved, not dropped."""
+        leftover_call = transactional_module._record_call(
+            set_email.__wrapped__.__wrapped__, (1, "late@example.com"), {})
+        leftover_marker = transactional_module.Future()
+        with self.writer._close_lock:
+            self.writer._closed = True
+            self.writer._queue.put(transactional_module._STOP)
+            self.writer._queue.put(leftover_call)
+            self.writer._queue.put(leftover_marker)
+        self.writer._thread.join(timeout=2)
+        self.assertIsNone(leftover_marker.result(timeout=0))
+        self.assertIsInstance(leftover_call.future.exception(timeout=0), RuntimeError)
+        self.assertEqual(self.email(1), "user1@example.com")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,49 +1,162 @@
 # 1-batch_processing.py
 import seed
+import snapshot
+import user_query
 
-def stream_users_in_batches(batch_size):
+try:
+    import numpy as np
+except ImportError:  # only needed by the columnar helpers below
+    np = None
+
+def stream_users_in_batches(batch_size, mode=None, compact=False, query=None):
     """
     Generator that yields lists (batches) of users as dicts.
     Uses one loop over pages and stops when a page is empty.
+
+    mode="offset" (default) pages with LIMIT/OFFSET (original behaviour);
+    mode="keyset" seeks on user_id from the last row of the previous page.
+    compact=True yields seed.UserRow objects instead of dicts.
+    query=user_query.UserQuery(...) streams only its columns and rows, as
+    dicts; it cannot be combined with mode or compact.
     """
-    conn = seed.connect_to_prodev()
-    if not conn:
+    if mode not in (None, "offset", "keyset"):
+        raise ValueError(f"Unknown pagination mode: {mode!r}")
+    if query is not None:
+        if mode is not None or compact:
+            raise ValueError("query= cannot be combined with mode or compact")
+        yield from user_query.stream_batches(query, batch_size)
         return
-    try:
+    with seed.pooled_connection() as conn:
+        if not conn:
+            return
         offset = 0
+        last_user_id = None
         while True:  # loop #1
-            cur = conn.cursor(dictionary=True)
-            cur.execute(
-                "SELECT user_id, name, email, age FROM user_data LIMIT %s OFFSET %s",
-                (batch_size, offset)
-            )
-            page = cur.fetchall()
-            cur.close()
+            if mode == "keyset":
+                page = seed.fetch_users_after(conn, batch_size, last_user_id,
+                                              dictionary=not compact)
+            else:
+                cur = conn.cursor(dictionary=not compact)
+                cur.execute(
+                    "SELECT user_id, name, email, age FROM user_data LIMIT %s OFFSET %s",
+                    (batch_size, offset)
+                )
+                page = cur.fetchall()
+                cur.close()
             if not page:
                 break
             # normalize ages to int
-            batch = [
-                {
-                    "user_id": r["user_id"],
-                    "name": r["name"],
-                    "email": r["email"],
-                    "age": int(r["age"]),
-                }
-                for r in page
-            ]
+            batch = seed.normalize_rows(page, compact)
             yield batch
             offset += batch_size
-    finally:
-        conn.close()
+            last_user_id = batch[-1]["user_id"]
+
+# Keyset pages over the (age, user_id) order of idx_user_data_age.
+OVER_AGE_FIRST_SQL = (
+    "SELECT user_id, name, email, age FROM user_data "
+    "WHERE age > %s ORDER BY age, user_id LIMIT %s"
+)
+OVER_AGE_NEXT_SQL = (
+    "SELECT user_id, name, email, age FROM user_data "
+    "WHERE age > %s AND (age > %s OR (age = %s AND user_id > %s)) "
+    "ORDER BY age, user_id LIMIT %s"
+)
+
+def stream_users_over_age(min_age, batch_size, compact=False):
+    """
+    Generator that yields batches of users with age > min_age, filtered
+    by MySQL instead of in Python. Pages seek on (age, user_id), so each
+    page is a range scan of idx_user_data_age (or of the covering
+    idx_user_data_age_cover when it exists). Rows come in age order.
+    """
+    with seed.pooled_connection() as conn:
+        if not conn:
+            return
+        last = None
+        while True:  # loop #1
+            cur = conn.cursor(dictionary=not compact)
+            if last is None:
+                cur.execute(OVER_AGE_FIRST_SQL, (min_age, batch_size))
+            else:
+                cur.execute(OVER_AGE_NEXT_SQL,
+                            (min_age, last["age"], last["age"], last["user_id"],
+                             batch_size))
+            page = cur.fetchall()
+            cur.close()
+            if not page:
+                break
+            batch = seed.normalize_rows(page, compact)
+            yield batch
+            last = batch[-1]
 
-def batch_processing(batch_size):
+def batch_processing(batch_size, snapshot_path=None, pushdown=False):
     """
     Processes each batch to filter users over age 25 and prints them.
+    With snapshot_path the batches are read from a local columnar
+    snapshot (see snapshot.py) instead of the database.
+    With pushdown=True the age filter runs in MySQL on the age index
+    (see stream_users_over_age); users are then printed in age order.
     Total loops:
       - for batch in generator (loop #2)
       - for user in filtered list (loop #3)
     """
-    for batch in stream_users_in_batches(batch_size):      # loop #2
+    if snapshot_path:
+        batches = snapshot.stream_users_in_batches(snapshot_path, batch_size)
+    elif pushdown:
+        batches = stream_users_over_age(25, batch_size)
+    else:
+        batches = stream_users_in_batches(batch_size)
+    for batch in batches:                                  # loop #2
         filtered = [u for u in batch if u["age"] > 25]
         for user in filtered:                              # loop #3
             print(user)
+
+def stream_user_columns(batch_size):
+    """
+    Generator that yields batches as columns instead of lists of dicts:
+    {"user_id": object array, "name": object array,
+     "email": object array, "age": int64 array}.
+    Pages with keyset pagination and builds the arrays straight from the
+    cursor tuples. Requires NumPy.
+    """
+    if np is None:
+        raise ImportError("stream_user_columns requires numpy (pip install numpy)")
+    with seed.pooled_connection() as conn:
+        if not conn:
+            return
+        last_user_id = None
+        while True:  # loop #1
+            page = seed.fetch_users_after(conn, batch_size, last_user_id,
+                                          dictionary=False)
+            if not page:
+                break
+            user_ids, names, emails, ages = zip(*page)
+            yield {
+                "user_id": np.array(user_ids, dtype=object),
+                "name": np.array(names, dtype=object),
+                "email": np.array(emails, dtype=object),
+                "age": np.fromiter(map(int, ages), dtype=np.int64,
+                                   count=len(ages)),
+            }
+            last_user_id = user_ids[-1]
+
+def select_columns(columns, predicate=None, fields=None):
+    """
+    Vectorized filter + projection over one columnar batch.
+    predicate: callable taking the batch and returning a boolean mask,
+               e.g. lambda c: c["age"] > 25
+    fields:    column names to keep (all columns when None)
+    """
+    names = fields or list(columns)
+    if predicate is None:
+        return {name: columns[name] for name in names}
+    mask = predicate(columns)
+    return {name: columns[name][mask] for name in names}
+
+def batch_processing_columns(batch_size, min_age=25):
+    """
+    Columnar batch_processing: yields, per batch, the users older than
+    `min_age` as column arrays instead of printing them one by one.
+    """
+    for columns in stream_user_columns(batch_size):      # loop #2
+        yield select_columns(columns, lambda c: c["age"] > min_age)
@@ -1,48 +1,193 @@
 # 2-lazy_paginate.py
+import queue
+import threading
+
 import seed
 
-def paginate_users(page_size, offset):
+_DONE = object()
+
+def paginate_users(page_size, offset, compact=False):
     """
     Fetch a single page of users at the given offset.
-    Returns a list of dict rows.
+    Returns a list of dict rows (seed.UserRow objects if compact).
     """
-    conn = seed.connect_to_prodev()
-    if not conn:
-        return []
-    try:
-        cur = conn.cursor(dictionary=True)
+    with seed.pooled_connection() as conn:
+        if not conn:
+            return []
+        cur = conn.cursor(dictionary=not compact)
         cur.execute(
-            "SELECT * FROM user_data LIMIT %s OFFSET %s",
+            "SELECT user_id, name, email, age FROM user_data LIMIT %s OFFSET %s",
             (page_size, offset)
         )
         rows = cur.fetchall()
         cur.close()
-        return [
-            {
-                "user_id": r["user_id"],
-                "name": r["name"],
-                "email": r["email"],
-                "age": int(r["age"]),
-            }
-            for r in rows
-        ]
+        return seed.normalize_rows(rows, compact)
+
+
+def paginate_users_after(page_size, last_user_id=None, compact=False):
+    """
+    Fetch the page of users that follows `last_user_id` (keyset pagination).
+    Pass None for the first page. Returns a list of dict rows
+    (seed.UserRow objects if compact).
+    """
+    with seed.pooled_connection() as conn:
+        if not conn:
+            return []
+        rows = seed.fetch_users_after(conn, page_size, last_user_id,
+                                      dictionary=not compact)
+        return seed.normalize_rows(rows, compact)
+
+
+def stream_pages(page_size, compact=False):
+    """
+    Generator that yields pages from a single result stream.
+    Holds one pooled connection and reads an unbuffered (server-side)
+    cursor with fetchmany(), so there is no reconnect per page.
+    Closing the generator early closes the cursor and discards the
+    connection, since it still has an unread result.
+    """
+    with seed.pooled_connection() as conn:
+        if not conn:
+            return
+        cur = conn.cursor(dictionary=not compact, buffered=False)
+        try:
+            cur.execute("SELECT user_id, name, email, age FROM user_data")
+            while True:  # one loop
+                rows = cur.fetchmany(page_size)
+                if not rows:
+                    break
+                yield seed.normalize_rows(rows, compact)
+        finally:
+            # cursor.close() can complain about the unread result left by an
+            # early close; the pool drops that connection on GeneratorExit.
+            try:
+                cur.close()
+            except Exception:
+                pass
+
+
+class PrefetchStats:
+    """
+    Queue occupancy metrics for prefetch_pages.
+    Each time the consumer asks for the next page (`polls`), the number of
+    pages already waiting in the queue is recorded; `starved` counts the
+    times it was empty (the consumer had to wait for the database).
+    """
+
+    def __init__(self):
+        self.polls = 0
+        self.occupancy_total = 0
+        self.max_occupancy = 0
+        self.starved = 0
+
+    def record(self, occupancy):
+        self.polls += 1
+        self.occupancy_total += occupancy
+        self.max_occupancy = max(self.max_occupancy, occupancy)
+        if not occupancy:
+            self.starved += 1
+
+    @property
+    def mean_occupancy(self):
+        return (self.occupancy_total / self.polls) if self.polls else 0.0
+
+    def as_dict(self):
+        return {
+            "polls": self.polls,
+            "mean_occupancy": self.mean_occupancy,
+            "max_occupancy": self.max_occupancy,
+            "starved": self.starved,
+        }
+
+
+def prefetch_pages(pages, depth, stats=None):
+    """
+    Generator that yields from the iterator `pages` while a background
+    thread fetches up to `depth` pages ahead into a bounded queue.
+    Exceptions raised while fetching are re-raised here; closing this
+    generator stops the thread and closes `pages` before returning.
+    """
+    if depth < 1:
+        raise ValueError("prefetch depth must be at least 1")
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        # The source generator lives entirely on this thread.
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+        finally:
+            close = getattr(pages, "close", None)
+            if close:
+                close()
+
+    worker = threading.Thread(target=produce, name="lazy-paginate-prefetch",
+                              daemon=True)
+    worker.start()
+    try:
+        while True:  # one loop
+            if stats is not None:
+                stats.record(buffer.qsize())
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
     finally:
-        conn.close()
+        stop.set()
+        worker.join()
 
 
-def lazy_paginate(page_size):
+def lazy_paginate(page_size, mode="offset", compact=False, prefetch=0,
+                  stats=None):
     """
     Generator that yields one page (list of users) at a time.
     Only one loop allowed.
+
+    mode="offset" pages with LIMIT/OFFSET (original behaviour);
+    mode="keyset" seeks on user_id, so deep pages cost the same as the first;
+    mode="stream" reads every page from one connection (see stream_pages).
+    compact=True yields pages of seed.UserRow objects instead of dicts.
+    prefetch=K fetches up to K pages ahead on a background thread while
+    the caller works on the current one; pass a PrefetchStats as `stats`
+    to collect queue occupancy.
     """
+    if mode not in ("offset", "keyset", "stream"):
+        raise ValueError(f"Unknown pagination mode: {mode!r}")
+    if prefetch:
+        pages = lazy_paginate(page_size, mode, compact)
+        yield from prefetch_pages(pages, prefetch, stats)
+        return
+    if mode == "stream":
+        yield from stream_pages(page_size, compact)
+        return
     offset = 0
+    last_user_id = None
     while True:  # one loop
-        page = paginate_users(page_size, offset)
+        if mode == "keyset":
+            page = paginate_users_after(page_size, last_user_id, compact)
+        else:
+            page = paginate_users(page_size, offset, compact)
         if not page:
             break
         yield page
         offset += page_size
+        last_user_id = page[-1]["user_id"]
 
 # Some checkers expect this exact symbol name:
 lazy_pagination = lazy_paginate
-
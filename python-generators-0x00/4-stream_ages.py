@@ -1,38 +1,126 @@
 # 4-stream_ages.py
+import math
+
 import seed
+import snapshot
 
 def stream_user_ages():
     """
     Generator that yields ages (as ints) one by one.
     Uses a single loop over the cursor.
     """
-    conn = seed.connect_to_prodev()
-    if not conn:
-        return
-    try:
+    with seed.pooled_connection() as conn:
+        if not conn:
+            return
         cur = conn.cursor()
-        cur.execute("SELECT age FROM user_data")
-        for (age,) in cur:   # loop #1
-            # age may be Decimal -> cast to int
-            yield int(age)
-    finally:
         try:
-            cur.close()
-        except Exception:
-            pass
-        conn.close()
-
-def print_average_age():
-    """
-    Consumes the generator and prints the average without loading all rows.
-    Uses at most one loop here -> total ≤ 2 loops for the file.
-    """
-    total = 0
-    count = 0
-    for age in stream_user_ages():   # loop #2
-        total += age
-        count += 1
-    avg = (total / count) if count else 0
+            cur.execute("SELECT age FROM user_data")
+            for (age,) in cur:   # loop #1
+                # age may be Decimal -> cast to int
+                yield int(age)
+        finally:
+            try:
+                cur.close()
+            except Exception:
+                pass
+
+class AgeStats:
+    """
+    Single-pass accumulator for a stream of ages.
+
+    Keeps count/sum/min/max, a Welford running mean and variance, and an
+    exact histogram of values (ages are DECIMAL(3,0), so there are at most
+    a thousand distinct buckets) from which percentiles are read.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.histogram = {}
+
+    def add(self, age, times=1):
+        """Adds `age` to the stats `times` times (times > 1 for histograms)."""
+        self.count += times
+        self.total += age * times
+        self.minimum = age if self.minimum is None else min(self.minimum, age)
+        self.maximum = age if self.maximum is None else max(self.maximum, age)
+        self.histogram[age] = self.histogram.get(age, 0) + times
+        # Welford / Chan update for `times` identical observations
+        delta = age - self._mean
+        self._mean += delta * times / self.count
+        self._m2 += delta * (age - self._mean) * times
+
+    def percentile(self, p):
+        """Nearest-rank percentile (0 < p <= 100) from the histogram."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(p / 100 * self.count))
+        seen = 0
+        for age in sorted(self.histogram):
+            seen += self.histogram[age]
+            if seen >= rank:
+                return age
+        return self.maximum
+
+    def result(self, percentiles=(50, 90, 99)):
+        """Returns the stats as a dict."""
+        variance = (self._m2 / self.count) if self.count else 0.0
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "avg": (self.total / self.count) if self.count else 0,
+            "min": self.minimum,
+            "max": self.maximum,
+            "variance": variance,
+            "stddev": math.sqrt(variance),
+            "percentiles": {p: self.percentile(p) for p in percentiles},
+        }
+
+
+def age_stats(source=None, percentiles=(50, 90, 99)):
+    """
+    Computes count/sum/avg/min/max/variance/percentiles of user ages.
+
+    With source=None the work is pushed down to MySQL: one GROUP BY age
+    query returns at most one row per distinct age, and the stats are
+    built from that histogram. Pass any iterable of ages (for example
+    stream_user_ages()) to compute the same stats in a single pass.
+    """
+    stats = AgeStats()
+    if source is not None:
+        for age in source:
+            stats.add(age)
+        return stats.result(percentiles)
+
+    with seed.pooled_connection() as conn:
+        if conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    "SELECT age, COUNT(*) FROM user_data GROUP BY age ORDER BY age"
+                )
+                for age, n in cur.fetchall():
+                    stats.add(int(age), int(n))
+            finally:
+                cur.close()
+    return stats.result(percentiles)
+
+def print_average_age(snapshot_path=None):
+    """
+    Prints the average age without loading all rows.
+    The sum and count are computed by MySQL (see age_stats), or straight
+    from the memory-mapped age column of a local snapshot file.
+    """
+    if snapshot_path:
+        with snapshot.Snapshot(snapshot_path) as snap:
+            ages = snap.ages
+            avg = (sum(ages) / len(ages)) if len(ages) else 0
+    else:
+        avg = age_stats()["avg"]
     print(f"Average age of users: {avg:.2f}")
 
 if __name__ == "__main__":
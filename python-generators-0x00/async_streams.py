@@ -0,0 +1,113 @@
+# async_streams.py
+"""
+Asyncio versions of the user streams, for use with `async for`.
+
+mysql.connector is blocking, so every database call runs on a worker
+thread dedicated to the stream (one pooled connection, one thread, calls
+executed in order). A producer task fetches keyset pages ahead of the
+consumer into a bounded asyncio.Queue: up to `prefetch` pages wait there
+while the consumer works, and the producer pauses when the queue is full.
+
+Example:
+    async for batch in async_stream_users_in_batches(500):
+        await handle(batch)
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+
+import seed
+
+_DONE = object()
+
+
+class _Failure:
+    """Carries a producer exception through the queue to the consumer."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+async def _produce(loop, executor, conn, page_size, queue):
+    last_user_id = None
+    try:
+        while True:
+            page = await loop.run_in_executor(
+                executor, seed.fetch_users_after, conn, page_size, last_user_id
+            )
+            if not page:
+                break
+            await queue.put(seed.normalize_rows(page))
+            last_user_id = page[-1]["user_id"]
+        await queue.put(_DONE)
+    except Exception as e:
+        await queue.put(_Failure(e))
+
+
+async def _pages(page_size, prefetch):
+    """Async generator of keyset pages with `prefetch` pages read ahead."""
+    if prefetch < 1:
+        raise ValueError("prefetch must be at least 1")
+    loop = asyncio.get_running_loop()
+    # One thread per stream: calls on the connection run in submission
+    # order, so the final release always runs after any in-flight fetch.
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-stream")
+    pool = seed.get_pool()
+    try:
+        conn = await loop.run_in_executor(executor, pool.acquire)
+        if not conn:
+            return
+        queue = asyncio.Queue(maxsize=prefetch)
+        producer = asyncio.create_task(
+            _produce(loop, executor, conn, page_size, queue)
+        )
+        failed = False
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Failure):
+                    failed = True
+                    raise item.error
+                yield item
+        finally:
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
+            await loop.run_in_executor(executor, pool.release, conn, failed)
+    finally:
+        executor.shutdown(wait=False)
+
+
+async def async_stream_users(prefetch=2, page_size=1000):
+    """
+    Async generator that yields user dicts one by one
+    (async counterpart of stream_users).
+    """
+    async with aclosing(_pages(page_size, prefetch)) as pages:
+        async for page in pages:
+            for user in page:
+                yield user
+
+
+async def async_stream_users_in_batches(batch_size, prefetch=2):
+    """
+    Async generator that yields lists of user dicts
+    (async counterpart of stream_users_in_batches).
+    """
+    async with aclosing(_pages(batch_size, prefetch)) as pages:
+        async for page in pages:
+            yield page
+
+
+async def async_lazy_paginate(page_size, prefetch=2):
+    """
+    Async generator that yields one page of users at a time
+    (async counterpart of lazy_paginate).
+    """
+    async with aclosing(_pages(page_size, prefetch)) as pages:
+        async for page in pages:
+            yield page
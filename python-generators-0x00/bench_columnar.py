@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# bench_columnar.py
+"""
+Benchmark: dict batches vs NumPy column batches for the age > 25 filter.
+
+Both paths read user_data with keyset pagination, keep the users older
+than 25 and compute their count and mean age; nothing is printed, so the
+numbers reflect fetching + filtering only.
+
+Usage:
+    python3 bench_columnar.py [--batch-size 1000] [--repeat 3]
+"""
+import argparse
+import time
+
+batching = __import__('1-batch_processing')
+
+
+def dict_path(batch_size):
+    count = 0
+    total = 0
+    for batch in batching.stream_users_in_batches(batch_size, mode="keyset"):
+        filtered = [u for u in batch if u["age"] > 25]
+        count += len(filtered)
+        total += sum(u["age"] for u in filtered)
+    return count, (total / count) if count else 0
+
+
+def columnar_path(batch_size):
+    count = 0
+    total = 0
+    for columns in batching.batch_processing_columns(batch_size):
+        ages = columns["age"]
+        count += ages.size
+        total += int(ages.sum())
+    return count, (total / count) if count else 0
+
+
+def timed(func, batch_size, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(batch_size)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for name, func in (("dict", dict_path), ("columnar", columnar_path)):
+        best, (count, avg) = timed(func, args.batch_size, args.repeat)
+        print(f"{name:>9}: {best:8.3f}s  matched={count:,}  avg_age={avg:.2f}")
+
+
+if __name__ == "__main__":
+    main()
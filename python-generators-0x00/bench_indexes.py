@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# bench_indexes.py
+"""
+Benchmark: filtered streaming of user_data with and without secondary
+indexes.
+
+Times three jobs against ALX_prodev:
+  - python filter : stream_users_in_batches (keyset) + `age > N` in Python
+  - sql filter    : stream_users_over_age (predicate pushed into MySQL)
+  - ages only     : SELECT age (stream_user_ages)
+first with the secondary indexes dropped, then with them created
+(idx_user_data_age, plus idx_user_data_age_cover with --covering).
+The declared indexes are left in place afterwards.
+
+Usage:
+    python3 bench_indexes.py [--min-age 25] [--batch-size 1000] [--covering]
+"""
+import argparse
+import time
+
+import seed
+
+batching = __import__('1-batch_processing')
+ages = __import__('4-stream_ages')
+
+
+def python_filter(min_age, batch_size):
+    return sum(
+        sum(1 for u in batch if u["age"] > min_age)
+        for batch in batching.stream_users_in_batches(batch_size, mode="keyset")
+    )
+
+
+def sql_filter(min_age, batch_size):
+    return sum(len(batch) for batch in batching.stream_users_over_age(min_age, batch_size))
+
+
+def ages_only(min_age, batch_size):
+    return sum(1 for _ in ages.stream_user_ages())
+
+
+def run_all(label, min_age, batch_size):
+    for name, job in (("python filter", python_filter),
+                      ("sql filter", sql_filter),
+                      ("ages only", ages_only)):
+        started = time.perf_counter()
+        rows = job(min_age, batch_size)
+        elapsed = time.perf_counter() - started
+        print(f"{label:>14} | {name:<13}: {elapsed:8.3f}s  rows={rows:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--min-age", type=int, default=25)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--covering", action="store_true")
+    args = parser.parse_args()
+
+    indexes = dict(seed.USER_DATA_INDEXES)
+    if args.covering:
+        indexes.update(seed.COVERING_INDEXES)
+
+    with seed.pooled_connection() as conn:
+        if not conn:
+            raise SystemExit("Could not connect to ALX_prodev")
+        seed.drop_indexes(conn, list(seed.USER_DATA_INDEXES) + list(seed.COVERING_INDEXES))
+    run_all("no indexes", args.min_age, args.batch_size)
+
+    with seed.pooled_connection() as conn:
+        seed.ensure_indexes(conn, indexes)
+    run_all("with indexes", args.min_age, args.batch_size)
+
+    if args.covering:
+        with seed.pooled_connection() as conn:
+            seed.drop_indexes(conn, list(seed.COVERING_INDEXES))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# bench_ingest.py
+"""
+Benchmark: seed.insert_data with engine="executemany" vs engine="load_data".
+
+Generates a synthetic CSV (1M rows by default), then loads it with each
+engine into a scratch database (ALX_prodev_bench, user_data truncated
+before every run) and prints the wall time and rows/sec.
+
+Usage:
+    python3 bench_ingest.py [--rows 1000000] [--repeat 1]
+
+The MySQL server must allow LOAD DATA LOCAL (local_infile=ON).
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+import uuid
+
+import seed
+
+BENCH_DB = "ALX_prodev_bench"
+
+
+def write_synthetic_csv(path, rows):
+    """Writes `rows` fake users in the user_data.csv layout."""
+    with open(path, "w", newline='', encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["user_id", "name", "email", "age"])
+        for i in range(rows):
+            writer.writerow([
+                str(uuid.uuid4()),
+                f"User {i}",
+                f"user{i}@example.com",
+                18 + i % 80,
+            ])
+
+
+def run_engine(engine, csv_path):
+    """Truncates user_data, loads the CSV with `engine`, returns seconds."""
+    conn = seed.connect_to_prodev(database=BENCH_DB, allow_local_infile=True)
+    if not conn:
+        raise SystemExit("Could not connect to the benchmark database")
+    try:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE TABLE user_data")
+        started = time.perf_counter()
+        seed.insert_data(conn, csv_path, engine=engine)
+        return time.perf_counter() - started
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    server = seed.connect_db()
+    if not server:
+        raise SystemExit("Could not connect to MySQL")
+    with server.cursor() as cur:
+        cur.execute(f"CREATE DATABASE IF NOT EXISTS {BENCH_DB};")
+    server.close()
+
+    conn = seed.connect_to_prodev(database=BENCH_DB)
+    seed.create_table(conn)
+    conn.close()
+
+    fd, csv_path = tempfile.mkstemp(prefix="bench_users_", suffix=".csv")
+    os.close(fd)
+    try:
+        print(f"Generating {args.rows:,} rows -> {csv_path}")
+        write_synthetic_csv(csv_path, args.rows)
+        for engine in ("executemany", "load_data"):
+            best = min(run_engine(engine, csv_path) for _ in range(args.repeat))
+            print(f"{engine:>12}: {best:8.2f}s  {args.rows / best:12,.0f} rows/sec")
+    finally:
+        os.remove(csv_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# bench_rows.py
+"""
+Benchmark: dict rows vs compact seed.UserRow rows.
+
+Builds --rows rows (1M by default) from synthetic cursor tuples both ways
+and reports build time and the memory held by the resulting list
+(tracemalloc). With --db it also times a full stream_users() pass over
+user_data for each row type.
+
+Usage:
+    python3 bench_rows.py [--rows 1000000] [--db]
+"""
+import argparse
+import time
+import tracemalloc
+import uuid
+from decimal import Decimal
+
+import seed
+
+stream = __import__('0-stream_users')
+
+
+def as_dict(r):
+    return {"user_id": r[0], "name": r[1], "email": r[2], "age": int(r[3])}
+
+
+def measure(build, tuples):
+    """Returns (seconds, bytes held) for materializing build() over tuples."""
+    started = time.perf_counter()
+    rows = [build(t) for t in tuples]
+    elapsed = time.perf_counter() - started
+    del rows
+    # measured in a second pass: tracemalloc itself slows allocation down
+    tracemalloc.start()
+    rows = [build(t) for t in tuples]
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return elapsed, held
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--db", action="store_true",
+                        help="also stream user_data from MySQL")
+    args = parser.parse_args()
+
+    tuples = [
+        (str(uuid.uuid4()), f"User {i}", f"user{i}@example.com", Decimal(18 + i % 80))
+        for i in range(args.rows)
+    ]
+    print(f"Materializing {args.rows:,} rows")
+    for name, build in (("dict", as_dict), ("UserRow", seed.UserRow.from_row)):
+        elapsed, held = measure(build, tuples)
+        print(f"{name:>8}: {elapsed:7.3f}s  {args.rows / elapsed:12,.0f} rows/sec"
+              f"  {held / 2**20:8.1f} MiB  ({held / args.rows:.0f} B/row)")
+
+    if args.db:
+        print("Streaming user_data")
+        for name, compact in (("dict", False), ("UserRow", True)):
+            started = time.perf_counter()
+            count = sum(1 for _ in stream.stream_users(compact=compact))
+            elapsed = time.perf_counter() - started
+            rate = count / elapsed if elapsed else 0.0
+            print(f"{name:>8}: {elapsed:7.3f}s  {rate:12,.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# parallel_scan.py
+"""
+Range-partitioned parallel scan of user_data.
+
+The user_id keyspace (UUID strings) is split into N contiguous ranges and
+each range is scanned by its own worker process with its own connection,
+using keyset pagination inside the range. A user-supplied function runs
+on every batch (the same list-of-dicts batches stream_users_in_batches
+yields); results come back either as an ordered stream or reduced to a
+single value.
+
+Functions passed in must be picklable (defined at module level).
+
+Example:
+    def count_over_25(batch):
+        return sum(1 for u in batch if u["age"] > 25)
+
+    total = partitioned_reduce(count_over_25, operator.add, 0, workers=4)
+"""
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+import seed
+
+# Partition boundaries are prefixes of this many hex digits.
+PREFIX_DIGITS = 4
+
+
+def partition_bounds(partitions):
+    """
+    Splits the UUID keyspace into `partitions` contiguous [lo, hi) ranges
+    of hex prefixes. The first range has no lower bound and the last none
+    upper bound, so ids that are not lowercase UUIDs are still covered.
+    """
+    if partitions < 1:
+        raise ValueError("partitions must be at least 1")
+    space = 16 ** PREFIX_DIGITS
+    cuts = [
+        format(space * i // partitions, f"0{PREFIX_DIGITS}x")
+        for i in range(1, partitions)
+    ]
+    lows = [None] + cuts
+    highs = cuts + [None]
+    return list(zip(lows, highs))
+
+
+def _fetch_range_page(conn, batch_size, lo, hi, last_user_id):
+    conditions = []
+    params = []
+    if last_user_id is not None:
+        conditions.append("user_id > %s")
+        params.append(last_user_id)
+    elif lo is not None:
+        conditions.append("user_id >= %s")
+        params.append(lo)
+    if hi is not None:
+        conditions.append("user_id < %s")
+        params.append(hi)
+    where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute(
+            "SELECT user_id, name, email, age FROM user_data "
+            f"{where}ORDER BY user_id LIMIT %s",
+            (*params, batch_size)
+        )
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+def scan_range(lo, hi, batch_size):
+    """
+    Generator that yields batches (lists of user dicts) for lo <= user_id < hi
+    using keyset pagination on one pooled connection.
+    """
+    with seed.pooled_connection() as conn:
+        if not conn:
+            return
+        last_user_id = None
+        while True:
+            page = _fetch_range_page(conn, batch_size, lo, hi, last_user_id)
+            if not page:
+                break
+            yield seed.normalize_rows(page)
+            last_user_id = page[-1]["user_id"]
+
+
+def _map_range(fn, batch_size, bounds):
+    lo, hi = bounds
+    return [fn(batch) for batch in scan_range(lo, hi, batch_size)]
+
+
+def _reduce_range(fn, reducer, initial, batch_size, bounds):
+    lo, hi = bounds
+    acc = initial
+    for batch in scan_range(lo, hi, batch_size):
+        acc = reducer(acc, fn(batch))
+    return acc
+
+
+def partitioned_scan(fn, workers=4, batch_size=1000, partitions=None):
+    """
+    Generator that yields fn(batch) for every batch of user_data, in
+    user_id order. Each of `partitions` ranges (default: one per worker)
+    is scanned in a separate process; a range's results are yielded as
+    soon as it and all ranges before it are done.
+    """
+    bounds = partition_bounds(partitions or workers)
+    work = functools.partial(_map_range, fn, batch_size)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for results in pool.map(work, bounds):
+            yield from results
+
+
+def partitioned_reduce(fn, reducer, initial, workers=4, batch_size=1000,
+                       partitions=None, combine=None):
+    """
+    Scans user_data in parallel and reduces it to one value.
+    Each worker folds its range with reducer(acc, fn(batch)) starting from
+    `initial`; the per-range accumulators are then folded in user_id order
+    with `combine` (defaults to `reducer`, which fits associative
+    reductions such as operator.add).
+
+    Every range starts from `initial`, so it must be an identity value of
+    the reduction (0 for a sum, 1 for a product, [] for concatenation),
+    not a starting total.
+    """
+    bounds = partition_bounds(partitions or workers)
+    work = functools.partial(_reduce_range, fn, reducer, initial, batch_size)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return functools.reduce(combine or reducer, pool.map(work, bounds))
@@ -1,7 +1,13 @@
 # seed.py
 import csv
+import itertools
 import uuid
 import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
 import mysql.connector
 from mysql.connector import Error
 
@@ -9,6 +15,9 @@ from mysql.connector import Error
 MYSQL_HOST = os.getenv("MYSQL_HOST", "localhost")
 MYSQL_USER = os.getenv("MYSQL_USER", "root")
 MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD", "")
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "5"))
+MYSQL_POOL_TIMEOUT = float(os.getenv("MYSQL_POOL_TIMEOUT", "10"))
+MYSQL_POOL_MAX_LIFETIME = float(os.getenv("MYSQL_POOL_MAX_LIFETIME", "1800"))
 # --------------------------------------
 
 def connect_db():
@@ -35,23 +44,32 @@ def create_database(connection):
     with connection.cursor() as cur:
         cur.execute("CREATE DATABASE IF NOT EXISTS ALX_prodev;")
 
-def connect_to_prodev():
+def connect_to_prodev(**options):
     """
     Connects to the ALX_prodev database.
+    Extra keyword options (e.g. allow_local_infile=True) are passed
+    through to mysql.connector.connect and override the defaults.
     """
+    params = dict(
+        host=MYSQL_HOST,
+        user=MYSQL_USER,
+        password=MYSQL_PASSWORD,
+        database="ALX_prodev",
+        autocommit=True
+    )
+    params.update(options)
     try:
-        conn = mysql.connector.connect(
-            host=MYSQL_HOST,
-            user=MYSQL_USER,
-            password=MYSQL_PASSWORD,
-            database="ALX_prodev",
-            autocommit=True
-        )
+        conn = mysql.connector.connect(**params)
         return conn
     except Error as e:
         print(f"Error connecting to ALX_prodev: {e}")
         return None
 
+UPDATED_AT_COLUMN = (
+    "updated_at TIMESTAMP(6) NOT NULL "
+    "DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)"
+)
+
 def create_table(connection):
     """
     Creates table user_data if it doesn't exist.
@@ -59,50 +77,643 @@ def create_table(connection):
     name: VARCHAR NOT NULL
     email: VARCHAR NOT NULL
     age: DECIMAL NOT NULL  (we'll use DECIMAL(3,0) to match integer ages)
+    updated_at: set on insert and on every real change (change tracking)
     """
-    ddl = """
+    ddl = f"""
     CREATE TABLE IF NOT EXISTS user_data (
         user_id CHAR(36) PRIMARY KEY,
         name VARCHAR(255) NOT NULL,
         email VARCHAR(255) NOT NULL,
-        age DECIMAL(3,0) NOT NULL
+        age DECIMAL(3,0) NOT NULL,
+        {UPDATED_AT_COLUMN},
+        KEY idx_user_data_updated_at (updated_at, user_id)
     ) ENGINE=InnoDB;
     """
     with connection.cursor() as cur:
         cur.execute(ddl)
+    ensure_change_tracking(connection)
+    ensure_indexes(connection)
     print("Table user_data created successfully")
 
-def insert_data(connection, csv_path):
+def ensure_change_tracking(connection):
+    """
+    Adds the updated_at column and its index to a user_data table created
+    before change tracking existed. Safe to call repeatedly.
+    """
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT COUNT(*) FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = 'user_data' "
+            "AND column_name = 'updated_at'"
+        )
+        (has_column,) = cur.fetchone()
+        if not has_column:
+            cur.execute(
+                f"ALTER TABLE user_data ADD COLUMN {UPDATED_AT_COLUMN}, "
+                "ADD KEY idx_user_data_updated_at (updated_at, user_id)"
+            )
+
+INSERT_SQL = """
+INSERT INTO user_data (user_id, name, email, age)
+VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE user_id = user_data.user_id;
+"""
+
+# Column limits of user_data. Rows outside them are skipped here: strict
+# INSERTs would reject them, while LOAD DATA would truncate or coerce them.
+MAX_USER_ID_LENGTH = 36     # CHAR(36)
+MAX_TEXT_LENGTH = 255       # name, email: VARCHAR(255)
+MAX_AGE = 999               # DECIMAL(3,0)
+
+def normalize_record(record):
+    """
+    Validates one csv.DictReader record and returns a
+    (user_id, name, email, age) tuple, or None if it must be skipped.
+    If user_id is missing/empty, a UUID is generated.
+    Skips records whose fields do not fit user_data: an age that is not
+    a whole number from 0 to MAX_AGE, or a name, email or user_id that
+    is too long.
+    """
+    uid = record.get("user_id") or str(uuid.uuid4())
+    name = (record.get("name") or "").strip()
+    email = (record.get("email") or "").strip()
+    age = (record.get("age") or "").strip()
+    if not name or not email or age == "":
+        return None
+    if (len(uid) > MAX_USER_ID_LENGTH or len(name) > MAX_TEXT_LENGTH
+            or len(email) > MAX_TEXT_LENGTH):
+        return None
+    try:
+        value = Decimal(age)
+    except InvalidOperation:
+        return None
+    if not value.is_finite() or value != value.to_integral_value():
+        return None
+    if not 0 <= value <= MAX_AGE:
+        return None
+    return (uid, name, email, str(int(value)))
+
+def iter_csv_rows(csv_path):
+    """
+    Lazily yields validated (user_id, name, email, age) tuples from the CSV.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"CSV not found: {csv_path}")
+    with open(csv_path, newline='', encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            row = normalize_record(r)
+            if row is not None:
+                yield row
+
+# Secondary indexes on user_data: name -> indexed columns.
+# InnoDB appends the primary key to every secondary index, so
+# idx_user_data_age is really (age, user_id): it covers `SELECT age`
+# and `SELECT user_id ... WHERE age > ?` and orders ties by user_id.
+USER_DATA_INDEXES = {
+    "idx_user_data_age": ("age",),
+}
+
+# Opt-in covering index for the full-row `age > ?` stream
+# (stream_users_over_age): the scan never touches the clustered index.
+COVERING_INDEXES = {
+    "idx_user_data_age_cover": ("age", "name", "email"),
+}
+
+def existing_indexes(connection, table="user_data"):
+    """Returns the set of index names defined on `table`."""
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT DISTINCT index_name FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = %s",
+            (table,)
+        )
+        return {name for (name,) in cur.fetchall()}
+
+def ensure_indexes(connection, indexes=None, table="user_data"):
+    """
+    Creates the declared secondary indexes (USER_DATA_INDEXES by default)
+    that do not exist yet. Indexes are built online
+    (ALGORITHM=INPLACE, LOCK=NONE), so reads and writes continue while
+    they build. Returns the names of the indexes created.
+    """
+    indexes = USER_DATA_INDEXES if indexes is None else indexes
+    missing = [name for name in indexes if name not in existing_indexes(connection, table)]
+    with connection.cursor() as cur:
+        for name in missing:
+            columns = ", ".join(indexes[name])
+            cur.execute(
+                f"ALTER TABLE {table} ADD INDEX {name} ({columns}), "
+                "ALGORITHM=INPLACE, LOCK=NONE"
+            )
+            print(f"Index {name} created on {table}({columns})")
+    return missing
+
+def drop_indexes(connection, names, table="user_data"):
+    """Drops the named secondary indexes that exist. Returns those dropped."""
+    present = [name for name in names if name in existing_indexes(connection, table)]
+    with connection.cursor() as cur:
+        for name in present:
+            cur.execute(f"ALTER TABLE {table} DROP INDEX {name}, ALGORITHM=INPLACE, LOCK=NONE")
+    return present
+
+def insert_data(connection, csv_path, engine="executemany", chunk_size=5000):
     """
     Inserts CSV rows if they do not already exist.
     Expects CSV with headers: user_id (optional), name, email, age
     If user_id is missing/empty, a UUID is generated.
     Uses ON DUPLICATE KEY UPDATE to ignore duplicates.
+
+    engine="executemany" sends the rows as INSERT statements (default),
+    reading the CSV lazily and committing every `chunk_size` records
+    (insert_data_streaming without resume);
+    engine="load_data" uses load_data_infile (MySQL bulk loader).
+    """
+    if engine == "load_data":
+        return load_data_infile(connection, csv_path)
+    if engine != "executemany":
+        raise ValueError(f"Unknown ingest engine: {engine!r}")
+
+    sent = insert_data_streaming(connection, csv_path, chunk_size=chunk_size,
+                                 resume=False, report=False)
+    if not sent:
+        print("No rows to insert.")
+        return sent
+    print(f"Inserted/Skipped {sent} rows from {csv_path}")
+    return sent
+
+STAGING_DDL = """
+CREATE TEMPORARY TABLE IF NOT EXISTS user_data_staging (
+    user_id CHAR(36) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    age DECIMAL(3,0) NOT NULL
+) ENGINE=InnoDB;
+"""
+
+LOAD_STAGING_SQL = """
+LOAD DATA LOCAL INFILE %s INTO TABLE user_data_staging
+CHARACTER SET utf8mb4
+FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+LINES TERMINATED BY '\\n'
+(user_id, name, email, age);
+"""
+
+MERGE_STAGING_SQL = """
+INSERT INTO user_data (user_id, name, email, age)
+SELECT user_id, name, email, age FROM user_data_staging
+ON DUPLICATE KEY UPDATE user_id = user_data.user_id;
+"""
+
+def load_data_infile(connection, csv_path):
     """
+    Bulk-loads the CSV with LOAD DATA LOCAL INFILE.
+
+    Rows are validated and given UUIDs exactly like insert_data (via
+    iter_csv_rows), written to a normalized temp file, loaded into the
+    session's temporary user_data_staging table and merged into user_data.
+    If the load raises any warning (a value MySQL coerced), ValueError
+    is raised before the merge.
+    The connection must be opened with allow_local_infile=True, e.g.
+    connect_to_prodev(allow_local_infile=True), and the server needs
+    local_infile=ON. Returns the number of rows loaded.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix="user_data_", suffix=".csv")
+    try:
+        count = 0
+        with os.fdopen(fd, "w", newline='', encoding="utf-8") as out:
+            writer = csv.writer(out, quoting=csv.QUOTE_ALL, lineterminator="\n")
+            for row in iter_csv_rows(csv_path):
+                writer.writerow(row)
+                count += 1
+
+        if not count:
+            print("No rows to insert.")
+            return 0
+
+        with connection.cursor() as cur:
+            cur.execute(STAGING_DDL)
+            try:
+                cur.execute("TRUNCATE TABLE user_data_staging")
+                cur.execute(LOAD_STAGING_SQL, (tmp_path.replace(os.sep, "/"),))
+                # LOAD DATA turns data errors into warnings; never merge
+                # rows it had to coerce or truncate.
+                if cur.warning_count:
+                    raise ValueError(
+                        f"LOAD DATA reported {cur.warning_count} warnings for "
+                        f"{csv_path}; nothing was merged"
+                    )
+                cur.execute(MERGE_STAGING_SQL)
+            finally:
+                cur.execute("DROP TEMPORARY TABLE IF EXISTS user_data_staging")
+        print(f"Inserted/Skipped {count} rows from {csv_path} (LOAD DATA)")
+        return count
+    finally:
+        os.remove(tmp_path)
+
+def create_checkpoint_table(connection):
+    """
+    Creates table ingest_checkpoint, which remembers how many CSV records
+    of each source file insert_data_streaming has committed.
+    """
+    ddl = """
+    CREATE TABLE IF NOT EXISTS ingest_checkpoint (
+        source VARCHAR(512) PRIMARY KEY,
+        records_done BIGINT NOT NULL
+    ) ENGINE=InnoDB;
+    """
+    with connection.cursor() as cur:
+        cur.execute(ddl)
+
+def insert_data_streaming(connection, csv_path, chunk_size=5000, resume=True,
+                          report=True):
+    """
+    Streams CSV rows into user_data without loading the file in memory.
+
+    Rows are read lazily and committed every `chunk_size` CSV records, each
+    chunk in its own transaction together with its ingest_checkpoint row.
+    After a crash, calling again with resume=True skips the records already
+    committed and carries on from the next chunk. The checkpoint is removed
+    once the whole file is loaded. Prints rows/sec progress if `report`.
+    Returns the number of rows sent to the database in this run.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
     if not os.path.exists(csv_path):
         raise FileNotFoundError(f"CSV not found: {csv_path}")
+    source = os.path.abspath(csv_path)
+    create_checkpoint_table(connection)
+
+    done = 0
+    if resume:
+        with connection.cursor() as cur:
+            cur.execute(
+                "SELECT records_done FROM ingest_checkpoint WHERE source = %s",
+                (source,)
+            )
+            found = cur.fetchone()
+        if found:
+            done = int(found[0])
+            if report:
+                print(f"Resuming {csv_path} after {done} records")
 
-    rows = []
+    sent = 0
+    started = time.monotonic()
     with open(csv_path, newline='', encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            uid = r.get("user_id") or str(uuid.uuid4())
-            name = r.get("name", "").strip()
-            email = r.get("email", "").strip()
-            age = r.get("age", "").strip()
-            if not name or not email or age == "":
-                continue
-            rows.append((uid, name, email, age))
-
-    if not rows:
-        print("No rows to insert.")
-        return
+        records = itertools.islice(csv.DictReader(f), done, None)
+        while True:
+            chunk = list(itertools.islice(records, chunk_size))
+            if not chunk:
+                break
+            rows = [row for row in map(normalize_record, chunk) if row]
+            done += len(chunk)
+            connection.start_transaction()
+            try:
+                with connection.cursor() as cur:
+                    if rows:
+                        cur.executemany(INSERT_SQL, rows)
+                    cur.execute(
+                        "INSERT INTO ingest_checkpoint (source, records_done) "
+                        "VALUES (%s, %s) "
+                        "ON DUPLICATE KEY UPDATE records_done = VALUES(records_done)",
+                        (source, done)
+                    )
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            sent += len(rows)
+            if report:
+                elapsed = time.monotonic() - started
+                rate = sent / elapsed if elapsed else 0.0
+                print(f"Committed {done} records ({sent} rows, {rate:,.0f} rows/sec)")
 
-    sql = """
-    INSERT INTO user_data (user_id, name, email, age)
-    VALUES (%s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE user_id = user_data.user_id;
-    """
     with connection.cursor() as cur:
-        cur.executemany(sql, rows)
-    print(f"Inserted/Skipped {len(rows)} rows from {csv_path}")
+        cur.execute("DELETE FROM ingest_checkpoint WHERE source = %s", (source,))
+    if report:
+        print(f"Inserted/Skipped {sent} rows from {csv_path}")
+    return sent
+
+class UserRow:
+    """
+    Compact user_data row: four slots instead of a per-row dict.
+
+    Built straight from a plain cursor tuple (user_id, name, email, age).
+    Supports attribute access (row.age) and the dict-style access the
+    generators' callers already use (row["age"], row.get(), keys(),
+    items(), dict(row)), and compares equal to the matching dict.
+    """
+
+    __slots__ = ("user_id", "name", "email", "age")
+
+    def __init__(self, user_id, name, email, age):
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = age
+
+    @classmethod
+    def from_row(cls, row):
+        """Builds a UserRow from a (user_id, name, email, age) tuple."""
+        return cls(row[0], row[1], row[2], int(row[3]))
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def keys(self):
+        return self.__slots__
+
+    def values(self):
+        return tuple(getattr(self, k) for k in self.__slots__)
+
+    def items(self):
+        return tuple((k, getattr(self, k)) for k in self.__slots__)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, UserRow):
+            return self.values() == other.values()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+def normalize_rows(rows, compact=False):
+    """
+    Converts cursor rows into the public user dict shape (age as int),
+    or into UserRow objects when compact (rows are then plain tuples).
+    """
+    if compact:
+        return [UserRow.from_row(r) for r in rows]
+    return [
+        {
+            "user_id": r["user_id"],
+            "name": r["name"],
+            "email": r["email"],
+            "age": int(r["age"]),
+        }
+        for r in rows
+    ]
+
+# Keyset pages seek on the primary key instead of skipping OFFSET rows,
+# so every page costs one index range scan no matter how deep it is.
+FIRST_PAGE_SQL = (
+    "SELECT user_id, name, email, age FROM user_data "
+    "ORDER BY user_id LIMIT %s"
+)
+NEXT_PAGE_SQL = (
+    "SELECT user_id, name, email, age FROM user_data "
+    "WHERE user_id > %s ORDER BY user_id LIMIT %s"
+)
+
+def fetch_users_after(connection, limit, last_user_id=None, dictionary=True):
+    """
+    Fetches up to `limit` user rows (as dicts) ordered by user_id,
+    starting right after `last_user_id` (keyset / seek pagination).
+    Pass last_user_id=None to get the first page.
+    With dictionary=False rows are plain (user_id, name, email, age) tuples.
+    """
+    cur = connection.cursor(dictionary=dictionary)
+    try:
+        if last_user_id is None:
+            cur.execute(FIRST_PAGE_SQL, (limit,))
+        else:
+            cur.execute(NEXT_PAGE_SQL, (last_user_id, limit))
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free within the borrow timeout."""
+
+
+class ConnectionPool:
+    """
+    Small thread-safe pool of ALX_prodev connections.
+
+    - size: maximum number of open connections (idle + borrowed)
+    - timeout: seconds to wait for a free connection before PoolTimeout
+    - max_lifetime: connections older than this are closed instead of reused
+    - health_check: ping idle connections when they are borrowed
+    - connect: factory returning a new connection or None (connect_to_prodev)
+
+    Borrow with `with pool.connection() as conn:`; the pool itself is also a
+    context manager that closes every idle connection on exit.
+    stats() reports borrows, waits, creations, discards and timeouts.
+    """
+
+    def __init__(self, size=MYSQL_POOL_SIZE, timeout=MYSQL_POOL_TIMEOUT,
+                 max_lifetime=MYSQL_POOL_MAX_LIFETIME, health_check=True,
+                 connect=None):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check = health_check
+        self._connect = connect or connect_to_prodev
+        self._cond = threading.Condition()
+        self._idle = []        # stack of (conn, created_at)
+        self._born = {}        # id(conn) -> created_at for borrowed conns
+        self._live = 0
+        self._pid = os.getpid()
+        self._stats = {"borrows": 0, "waits": 0, "creations": 0,
+                       "discards": 0, "timeouts": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _check_fork(self):
+        # A forked child must not reuse the parent's sockets: forget them.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+            self._born = {}
+            self._live = 0
+
+    def _usable(self, conn, created_at):
+        if time.monotonic() - created_at > self.max_lifetime:
+            return False
+        if not self.health_check:
+            return True
+        try:
+            return conn.is_connected()
+        except Error:
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self, timeout=None):
+        """
+        Borrows a connection, creating one if the pool is not full.
+        Returns None if a new connection could not be opened.
+        Raises PoolTimeout if the pool stays exhausted past the timeout.
+        """
+        wait = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + wait
+        waited = False
+        while True:
+            entry = None
+            with self._cond:
+                self._check_fork()
+                while not self._idle and self._live >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"No connection available after {wait:.1f}s "
+                            f"(pool size {self.size})"
+                        )
+                    if not waited:
+                        waited = True
+                        self._stats["waits"] += 1
+                    self._cond.wait(remaining)
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    self._live += 1
+
+            if entry is None:
+                conn = self._connect()
+                with self._cond:
+                    if conn is None:
+                        self._live -= 1
+                        self._cond.notify()
+                        return None
+                    self._stats["creations"] += 1
+                    self._stats["borrows"] += 1
+                    self._born[id(conn)] = time.monotonic()
+                return conn
+
+            conn, created_at = entry
+            if self._usable(conn, created_at):
+                with self._cond:
+                    self._stats["borrows"] += 1
+                    self._born[id(conn)] = created_at
+                return conn
+            self._close_quietly(conn)
+            with self._cond:
+                self._live -= 1
+                self._stats["discards"] += 1
+                self._cond.notify()
+
+    def release(self, conn, discard=False):
+        """
+        Returns a borrowed connection. Connections that are flagged with
+        discard, past max_lifetime or still holding an unread result are
+        closed instead of going back to the idle stack.
+        """
+        if conn is None:
+            return
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            created_at = self._born.pop(id(conn), None)
+            if created_at is None:
+                return
+            expired = time.monotonic() - created_at > self.max_lifetime
+            if discard or expired or getattr(conn, "unread_result", False):
+                self._live -= 1
+                self._stats["discards"] += 1
+                self._cond.notify()
+            else:
+                self._idle.append((conn, created_at))
+                self._cond.notify()
+                return
+        self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager around acquire()/release(). If the body raises
+        (including GeneratorExit from a closed generator) the connection
+        is discarded, since it may be left mid-result.
+        """
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, discard=True)
+            raise
+        self.release(conn)
+
+    def stats(self):
+        """Returns a snapshot of the pool counters and current occupancy."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot.update(size=self.size, idle=len(self._idle),
+                            in_use=self._live - len(self._idle))
+            return snapshot
+
+    def close(self):
+        """Closes all idle connections; borrowed ones close on release."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._live -= len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """
+    Returns the process-wide ConnectionPool, creating it on first use
+    with the MYSQL_POOL_* settings.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+def configure_pool(**options):
+    """
+    Replaces the process-wide pool with one built from `options`
+    (see ConnectionPool). Idle connections of the old pool are closed.
+    """
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, ConnectionPool(**options)
+    if old is not None:
+        old.close()
+    return _pool
+
+def pooled_connection(timeout=None):
+    """
+    Borrows an ALX_prodev connection from the process-wide pool:
+
+        with seed.pooled_connection() as conn:
+            ...
+
+    Yields None (like connect_to_prodev) if the server is unreachable.
+    """
+    return get_pool().connection(timeout)
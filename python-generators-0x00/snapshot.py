@@ -0,0 +1,200 @@
+# snapshot.py
+"""
+Columnar on-disk snapshot of user_data.
+
+export_snapshot() streams the table (keyset pages) into one binary file
+laid out column by column; Snapshot memory-maps that file and serves the
+same generator API as the database streams, so repeat analytics runs read
+local disk instead of MySQL.
+
+File layout (native byte order, recorded in the header):
+    header    magic(8) | byteorder(8) | row count (u64)
+    sections  7 x (offset u64, length u64):
+              age, user_id offsets, user_id bytes, name offsets,
+              name bytes, email offsets, email bytes
+    data      ages as int16; each string column as n+1 u64 offsets into
+              a UTF-8 blob. Sections are 8-byte aligned.
+
+Ages and offsets are exposed as memoryviews over the mapping (no copy);
+strings are decoded only when a row is built.
+"""
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+import seed
+
+MAGIC = b"UDSNAP1\0"
+HEADER = struct.Struct("<8s8sQ")
+SECTION = struct.Struct("<QQ")
+STRING_COLUMNS = ("user_id", "name", "email")
+SECTION_NAMES = ("age",) + tuple(
+    f"{column}_{part}" for column in STRING_COLUMNS for part in ("offsets", "data")
+)
+
+
+def _pad(n):
+    return (-n) % 8
+
+
+def export_snapshot(path, batch_size=10000):
+    """
+    Streams user_data into a columnar snapshot file at `path`.
+    Each column is spilled to its own temp file while paging, then the
+    pieces are stitched together behind the header; the final file is
+    moved into place atomically. Returns the number of rows written.
+    """
+    spill_dir = tempfile.mkdtemp(prefix="user_snapshot_")
+    spills = {
+        name: open(os.path.join(spill_dir, name), "w+b") for name in SECTION_NAMES
+    }
+    try:
+        count = 0
+        ends = {column: 0 for column in STRING_COLUMNS}
+        for column in STRING_COLUMNS:
+            array("Q", [0]).tofile(spills[f"{column}_offsets"])
+
+        with seed.pooled_connection() as conn:
+            if not conn:
+                raise ConnectionError("Could not connect to ALX_prodev")
+            last_user_id = None
+            while True:
+                page = seed.fetch_users_after(conn, batch_size, last_user_id,
+                                              dictionary=False)
+                if not page:
+                    break
+                user_ids, names, emails, ages = zip(*page)
+                array("h", map(int, ages)).tofile(spills["age"])
+                for column, values in zip(STRING_COLUMNS, (user_ids, names, emails)):
+                    offsets = array("Q")
+                    blob = spills[f"{column}_data"]
+                    for value in values:
+                        encoded = value.encode("utf-8")
+                        blob.write(encoded)
+                        ends[column] += len(encoded)
+                        offsets.append(ends[column])
+                    offsets.tofile(spills[f"{column}_offsets"])
+                count += len(page)
+                last_user_id = user_ids[-1]
+
+        table_size = HEADER.size + SECTION.size * len(SECTION_NAMES)
+        position = table_size + _pad(table_size)
+        sections = []
+        for name in SECTION_NAMES:
+            length = spills[name].tell()
+            sections.append((position, length))
+            position += length + _pad(length)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as out:
+            out.write(HEADER.pack(MAGIC, sys.byteorder.encode().ljust(8, b"\0"), count))
+            for offset, length in sections:
+                out.write(SECTION.pack(offset, length))
+            for name, (offset, length) in zip(SECTION_NAMES, sections):
+                out.write(b"\0" * (offset - out.tell()))
+                spills[name].seek(0)
+                shutil.copyfileobj(spills[name], out)
+        os.replace(tmp_path, path)
+        return count
+    finally:
+        for spill in spills.values():
+            spill.close()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+class Snapshot:
+    """
+    Read-only, memory-mapped view of a snapshot file.
+
+        with Snapshot("users.snap") as snap:
+            for batch in snap.stream_users_in_batches(1000):
+                ...
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, byteorder, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a user_data snapshot")
+        if byteorder.rstrip(b"\0").decode() != sys.byteorder:
+            self.close()
+            raise ValueError(f"{path} was written on a {byteorder.decode()}-endian machine")
+        self._sections = {}
+        for i, name in enumerate(SECTION_NAMES):
+            offset, length = SECTION.unpack_from(self._map, HEADER.size + i * SECTION.size)
+            self._sections[name] = self._view[offset:offset + length]
+        self.ages = self._sections["age"].cast("h")
+        self._offsets = {
+            column: self._sections[f"{column}_offsets"].cast("Q")
+            for column in STRING_COLUMNS
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        """Releases every view and unmaps the file."""
+        for view in (getattr(self, "ages", None),
+                     *getattr(self, "_offsets", {}).values(),
+                     *getattr(self, "_sections", {}).values()):
+            if view is not None:
+                view.release()
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def _string(self, column, i):
+        offsets = self._offsets[column]
+        return str(self._sections[f"{column}_data"][offsets[i]:offsets[i + 1]], "utf-8")
+
+    def row(self, i, compact=False):
+        """Builds row `i` as a user dict (or seed.UserRow if compact)."""
+        values = (
+            self._string("user_id", i),
+            self._string("name", i),
+            self._string("email", i),
+            self.ages[i],
+        )
+        if compact:
+            return seed.UserRow(*values)
+        return dict(zip(("user_id", "name", "email", "age"), values))
+
+    def stream_users(self, compact=False):
+        """Generator that yields rows one by one, like stream_users()."""
+        for i in range(self.count):
+            yield self.row(i, compact)
+
+    def stream_users_in_batches(self, batch_size, compact=False):
+        """Generator that yields lists of rows, like stream_users_in_batches()."""
+        for start in range(0, self.count, batch_size):
+            stop = min(start + batch_size, self.count)
+            yield [self.row(i, compact) for i in range(start, stop)]
+
+    def stream_user_ages(self):
+        """Generator that yields ages one by one, like stream_user_ages()."""
+        yield from self.ages
+
+
+def stream_users(path, compact=False):
+    """Generator over the rows of the snapshot at `path`."""
+    with Snapshot(path) as snap:
+        yield from snap.stream_users(compact)
+
+
+def stream_users_in_batches(path, batch_size, compact=False):
+    """Generator over batches of rows of the snapshot at `path`."""
+    with Snapshot(path) as snap:
+        yield from snap.stream_users_in_batches(batch_size, compact)
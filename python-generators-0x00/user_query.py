@@ -0,0 +1,139 @@
+# user_query.py
+"""
+Small query builder for the user_data streams.
+
+Describes which columns, rows and order a stream needs, and compiles to
+one parameterized SELECT so filtering and projection happen in MySQL:
+
+    q = (UserQuery()
+         .select("user_id", "age")
+         .where("age", ">", 25)
+         .order_by("-age", "user_id"))
+    for user in stream(q):
+        ...                       # {"user_id": ..., "age": ...}
+
+Column names and operators are checked against whitelists; values are
+always sent as query parameters, never formatted into the SQL.
+"""
+import seed
+
+COLUMNS = ("user_id", "name", "email", "age", "updated_at")
+OPERATORS = ("=", "!=", "<", "<=", ">", ">=", "like", "in", "between")
+
+
+class UserQuery:
+    """Projection + predicates + ordering for a user_data SELECT."""
+
+    def __init__(self):
+        self.columns = ("user_id", "name", "email", "age")
+        self.predicates = []
+        self.ordering = []
+        self.row_limit = None
+
+    @staticmethod
+    def _check_column(column):
+        if column not in COLUMNS:
+            raise ValueError(f"Unknown user_data column: {column!r}")
+
+    def select(self, *columns):
+        """Only these columns are fetched (all four user columns by default)."""
+        if not columns:
+            raise ValueError("select() needs at least one column")
+        for column in columns:
+            self._check_column(column)
+        self.columns = columns
+        return self
+
+    def where(self, column, op, value):
+        """
+        Adds `column op value` (predicates are ANDed). "in" takes a
+        sequence, "between" a (low, high) pair.
+        """
+        self._check_column(column)
+        op = op.lower()
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {op!r}")
+        if op == "in" and (not isinstance(value, (list, tuple, set, frozenset))
+                           or not value):
+            raise ValueError("'in' needs a non-empty sequence")
+        if op == "between" and (not isinstance(value, (list, tuple))
+                                or len(value) != 2):
+            raise ValueError("'between' needs a (low, high) pair")
+        self.predicates.append((column, op, value))
+        return self
+
+    def order_by(self, *columns):
+        """Orders by these columns; prefix a name with '-' for DESC."""
+        for column in columns:
+            self._check_column(column.lstrip("-"))
+        self.ordering = list(columns)
+        return self
+
+    def limit(self, n):
+        self.row_limit = int(n)
+        return self
+
+    def compile(self):
+        """Returns (sql, params) for this query."""
+        sql = f"SELECT {', '.join(self.columns)} FROM user_data"
+        params = []
+        clauses = []
+        for column, op, value in self.predicates:
+            if op == "in":
+                clauses.append(f"{column} IN ({', '.join(['%s'] * len(value))})")
+                params.extend(value)
+            elif op == "between":
+                clauses.append(f"{column} BETWEEN %s AND %s")
+                params.extend(value)
+            else:
+                clauses.append(f"{column} {op.upper()} %s")
+                params.append(value)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if self.ordering:
+            terms = [
+                f"{c[1:]} DESC" if c.startswith("-") else c for c in self.ordering
+            ]
+            sql += " ORDER BY " + ", ".join(terms)
+        if self.row_limit is not None:
+            sql += " LIMIT %s"
+            params.append(self.row_limit)
+        return sql, tuple(params)
+
+    def __repr__(self):
+        return f"UserQuery({self.compile()[0]!r})"
+
+
+def stream_batches(query, batch_size=1000):
+    """
+    Generator that yields lists of row dicts (only the selected columns)
+    for `query`, read with fetchmany() from one unbuffered cursor.
+    """
+    sql, params = query.compile()
+    with seed.pooled_connection() as conn:
+        if not conn:
+            return
+        cur = conn.cursor(dictionary=True, buffered=False)
+        try:
+            cur.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                if "age" in query.columns:
+                    for r in rows:
+                        r["age"] = int(r["age"])
+                yield rows
+        finally:
+            # An early close leaves an unread result; the pool then
+            # discards the connection.
+            try:
+                cur.close()
+            except Exception:
+                pass
+
+
+def stream(query, batch_size=1000):
+    """Generator that yields the rows of `query` one by one."""
+    for batch in stream_batches(query, batch_size):
+        yield from batch